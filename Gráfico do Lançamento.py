@@ -1,6 +1,10 @@
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
 
+from trajetoria import open_trajectory
+
 # Dados fornecidos
 g = 0.4643  # aceleração em m/s²
 v0 = 1.9036  # velocidade inicial em m/s
@@ -21,7 +25,17 @@ x = v0 * np.cos(theta_rad) * t
 y = v0 * np.sin(theta_rad) * t - 0.5 * g * t**2
 
 # Plotando o gráfico
-plt.plot(x, y)
+plt.plot(x, y, label="Modelo")
+
+# Se uma trajetória medida (.traj) for passada na linha de comando, sobrepõe os pontos.
+# O arquivo é lido com np.memmap; só a janela de pontos plotada é convertida.
+if len(sys.argv) > 1:
+    cabecalho, trajetoria = open_trajectory(sys.argv[1])
+    passo = max(1, len(trajetoria) // 5000)  # Limita a quantidade de pontos desenhados
+    medidos = trajetoria[::passo]
+    plt.scatter(medidos["x_m"] - medidos["x_m"][0], medidos["y_m"] - medidos["y_m"][0],
+                s=8, color="red", label="Medido")
+    plt.legend()
 plt.title('Trajetória do Lançamento Oblíquo')
 plt.xlabel('Distância (m)')
 plt.ylabel('Altura (m)')
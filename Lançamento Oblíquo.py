@@ -1,158 +1,150 @@
+import argparse
+import os
+import time
+
 import cv2
 import numpy as np
 import tkinter as tk
-from PIL import Image, ImageTk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-def calibrate_scale_with_mouse(frame):
-    def draw_line(event, x, y, flags, param):
-        nonlocal ref_points, drawing
-        if event == cv2.EVENT_LBUTTONDOWN:
-            ref_points = [(x, y)]
-            drawing = True
-        elif event == cv2.EVENT_LBUTTONUP and drawing:
-            ref_points.append((x, y))
-            drawing = False
-            cv2.line(frame_copy, ref_points[0], ref_points[1], (0, 255, 0), 2)
-            cv2.imshow("Calibração", frame_copy)
-
-    ref_points = []
-    drawing = False
-    frame_copy = frame.copy()
-
-    cv2.imshow("Calibração", frame_copy)
-    cv2.setMouseCallback("Calibração", draw_line)
-
-    while True:
-        cv2.imshow("Calibração", frame_copy)
-        key = cv2.waitKey(1) & 0xFF
-        if key == 13 and len(ref_points) == 2: 
-            break
-
-    cv2.destroyAllWindows()
-
-    if len(ref_points) == 2:
-        pixel_distance = np.linalg.norm(np.array(ref_points[0]) - np.array(ref_points[1]))
-        real_distance = 1.5
-        scale_factor = real_distance / pixel_distance
-        print(f"Distância em pixels: {pixel_distance:.2f} pixels")
-        print(f"Distância real: {real_distance:.2f} metros")
-        return scale_factor
-    print("Calibração falhou. Tente novamente.")
-    return None
-
-def track_moving_object(video_path):
-    def update_frame():
-        nonlocal prev_gray, total_distance, total_velocity, total_acceleration, object_positions, frame_tk, object_height_meters
-        nonlocal max_height, max_velocity, max_distance, max_acceleration
-        nonlocal x_traj, y_traj
+from ajuste import OnlineTrajectoryFit
+from calibracao import add_calibration_arguments, calibration_options, resolve_scale
+from exibicao import FrameDisplay
+from grafico import IncrementalLinePlot
+from perfil import PROFILER
+from pipeline import TrackingPipeline, add_stream_arguments, open_source, stream_options
+from rastreador import STATE_DTYPE, BallisticTracker
+from trajetoria import TrajectoryWriter, video_hash
+
+def track_moving_object(video_path, display_fps=None, replay=False, latency_budget=None, **calibration):
+    def process_state(frame_index, timestamp, state):
+        nonlocal total_distance, total_velocity, total_acceleration, object_height_meters
+        nonlocal max_height, max_velocity, max_distance, max_acceleration, estimated_g
+
+        # Posição, velocidade e aceleração já vêm suavizadas pelo filtro balístico
+        center_x, center_y = state.x, state.y
+
+        if object_positions:
+            prev_x, prev_y = object_positions[-1]
+            distance = np.linalg.norm([center_x - prev_x, center_y - prev_y])
+            total_distance += distance
+            max_distance = max(max_distance, total_distance)
+
+            velocity = np.hypot(state.vx, state.vy)
+            velocities.append(velocity)
+            total_velocity += velocity
+            max_velocity = max(max_velocity, velocity)
+
+            acceleration = np.hypot(state.ax, state.ay)
+            accelerations.append(acceleration)
+            total_acceleration += acceleration
+            max_acceleration = max(max_acceleration, acceleration)
+
+        object_positions.append((center_x, center_y))
+        estimated_g = state.ay * pixel_to_meter
+        writer.append((frame_index, timestamp, state.detected,
+                       center_x * pixel_to_meter, (frame_height - center_y) * pixel_to_meter,
+                       state.vx * pixel_to_meter, -state.vy * pixel_to_meter,
+                       state.ax * pixel_to_meter, -state.ay * pixel_to_meter))
+        if state.detected:
+            online_fit.add(timestamp, center_x * pixel_to_meter, (frame_height - center_y) * pixel_to_meter)
+
+        object_height_pixels = frame_height - center_y
+        object_height_meters = object_height_pixels * pixel_to_meter
+        max_height = max(max_height, object_height_meters)
+
+        trajectory_plot.append(total_distance * pixel_to_meter, object_height_meters)
 
-        ret, frame = cap.read()
-        if not ret:
+    def update_frame():
+        # A detecção roda em outra thread e vê todos os frames; aqui só consumimos os resultados
+        new_detections = pipeline.poll_detections()
+        for frame_index, timestamp, _, state in new_detections:
+            if state is None:
+                # Trilha perdida: a próxima começa do zero, sem somar o salto até ela
+                object_positions.clear()
+            else:
+                process_state(frame_index, timestamp, state)
+
+        latest = pipeline.latest_frame()
+        if latest is None:
+            if pipeline.finished:
+                writer.close()
+                dump_profile()
+                return
+            if not stop_flag:
+                root.after(5, update_frame)
             return
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-        frame_diff = cv2.absdiff(prev_gray, gray)
-        _, thresh = cv2.threshold(frame_diff, 10, 255, cv2.THRESH_BINARY)
-
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-        thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        largest_contour = None
-        max_area = 0
-
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 20 and area > max_area: 
-                max_area = area
-                largest_contour = contour
-
-        if largest_contour is not None:
-            (x, y, w, h) = cv2.boundingRect(largest_contour)
-            center_x, center_y = x + w // 2, y + h // 2
-
-            if object_positions:
-                prev_x, prev_y = object_positions[-1]
-                distance = np.linalg.norm([center_x - prev_x, center_y - prev_y])
-                total_distance += distance
-                max_distance = max(max_distance, total_distance)
-
-                velocity = distance / frame_time
-                velocities.append(velocity)
-                total_velocity += velocity
-                max_velocity = max(max_velocity, velocity)
-
-                if len(velocities) > 1:
-                    acceleration = (velocities[-1] - velocities[-2]) / frame_time
-                    accelerations.append(acceleration)
-                    total_acceleration += abs(acceleration)
-                    max_acceleration = max(max_acceleration, abs(acceleration))
-
-            object_positions.append((center_x, center_y))
-
+        _, frame, detection = latest
+        if detection is not None:
+            (x, y, w, h), _, _ = detection
             cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
 
-            object_height_pixels = frame.shape[0] - center_y
-            object_height_meters = object_height_pixels * pixel_to_meter
-            max_height = max(max_height, object_height_meters)
-
-            x_traj.append(total_distance * pixel_to_meter)
-            y_traj.append(object_height_meters)
-
-        prev_gray = gray
-
         total_distance_m = total_distance * pixel_to_meter
         total_velocity_mps = (total_velocity / len(velocities)) * pixel_to_meter if velocities else 0
         total_acceleration_mps2 = (total_acceleration / len(accelerations)) * pixel_to_meter if accelerations else 0
 
+        fit = online_fit.summary()
+        fit_text = ""
+        if fit is not None:
+            fit_text = (f"Ajuste: a = {fit['a']:.4f}, b = {fit['b']:.4f}, c = {fit['c']:.4f}\n"
+                        f"g (ajuste): {fit['g']:.2f} m/s² | v0: {fit['v0']:.2f} m/s\n"
+                        f"Pouso previsto: x = {fit['pouso_x']:.2f} m\n")
+
         info_text.set(f"Distância: {total_distance_m:.2f} m\n"
                       f"Velocidade: {total_velocity_mps:.2f} m/s\n"
                       f"Aceleração: {total_acceleration_mps2:.2f} m/s²\n"
-                      f"Altura: {object_height_meters:.2f} m\n")
-
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame_pil = Image.fromarray(frame_rgb)
-        frame_tk = ImageTk.PhotoImage(image=frame_pil)
-        video_label.imgtk = frame_tk
-        video_label.configure(image=frame_tk)
-
-        if len(x_traj) > 1:
-            ax.clear()
-            ax.plot(x_traj, y_traj, label="Trajetória", color="blue")
-            ax.set_title("Gráfico de Trajetória")
-            ax.set_xlabel("Distância (m)")
-            ax.set_ylabel("Altura (m)")
-            ax.set_ylim(0, max(y_traj) + 1)
-            ax.grid()
-            ax.legend()
-            canvas.draw()
+                      f"Altura: {object_height_meters:.2f} m\n"
+                      f"g estimado: {estimated_g:.2f} m/s²\n"
+                      f"{fit_text}\n"
+                      f"{pipeline.stats_text()}\n"
+                      f"{display.stats_text()}\n"
+                      f"{PROFILER.summary_text()}")
+
+        # Reaproveita o mesmo buffer e o mesmo PhotoImage a cada frame
+        with PROFILER.stage("tk_image"):
+            display.show(frame)
+
+        # Desenha só o trecho novo da trajetória (blitting); reescala apenas quando necessário
+        with PROFILER.stage("canvas_draw"):
+            trajectory_plot.render()
 
         if not stop_flag:
-            root.after(10, update_frame)
+            root.after(5, update_frame)
+
+    def dump_profile():
+        # Com LANCAMENTO_PERFIL ligado, grava a linha do tempo dos estágios ao lado do vídeo
+        if PROFILER.enabled:
+            PROFILER.dump(output_base + "_perfil.json")
 
     def on_close():
         nonlocal stop_flag
         stop_flag = True
+        pipeline.stop()
+        writer.close()
+        dump_profile()
         cap.release()
         root.destroy()
 
-    cap = cv2.VideoCapture(video_path)
+    # Arquivo, câmera (índice) ou fluxo RTSP; câmeras e fluxos usam os tempos de captura
+    cap, live = open_source(video_path, replay)
     ret, frame = cap.read()
     if not ret:
         print("Erro ao carregar o vídeo.")
         return
+    is_file = os.path.isfile(video_path)
+    output_base = os.path.splitext(video_path)[0] if is_file else time.strftime("ao_vivo_%Y%m%d_%H%M%S")
 
-    pixel_to_meter = calibrate_scale_with_mouse(frame)
+    # Escala informada, salva (vídeo ou câmera) ou medida num marcador; o mouse só em último caso
+    pixel_to_meter, source = resolve_scale(frame, video_path if is_file else None, **calibration)
     if pixel_to_meter is None:
         print("Calibração falhou. Encerrando.")
         return
+    print(f"Escala: {pixel_to_meter:.6f} m/pixel ({source})")
 
-    prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    frame_height = frame.shape[0]
+    pipeline = TrackingPipeline(cap, frame, tracker=BallisticTracker(), live=live, latency_budget=latency_budget)
     object_positions = []
     total_distance = 0
     total_velocity = 0
@@ -162,15 +154,16 @@ def track_moving_object(video_path):
     max_velocity = 0
     max_distance = 0
     max_acceleration = 0
+    estimated_g = 0
+    online_fit = OnlineTrajectoryFit()
+
+    # A trajetória suavizada é gravada em disco enquanto o vídeo roda (ao lado do vídeo, em .traj)
+    writer = TrajectoryWriter(output_base + ".traj", STATE_DTYPE, fps=cap.get(cv2.CAP_PROP_FPS) or None,
+                              scale=pixel_to_meter, source_hash=video_hash(video_path) if is_file else None)
 
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_time = 1 / fps
     velocities = []
     accelerations = []
     stop_flag = False
-    frame_tk = None
-    x_traj = []
-    y_traj = []
 
     root = tk.Tk()
     root.title("Dashboard de Rastreamento de Objetos em Movimento")
@@ -182,6 +175,7 @@ def track_moving_object(video_path):
     video_card.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
     video_label = tk.Label(video_card, bg="#1e1e1e")
     video_label.pack(fill="both", expand=True)
+    display = FrameDisplay(video_label, display_fps)
 
     # Card para o gráfico
     graph_card = tk.Frame(root, bg="#1e1e1e", relief="raised", bd=2)
@@ -190,6 +184,12 @@ def track_moving_object(video_path):
     ax = figure.add_subplot(111)
     canvas = FigureCanvasTkAgg(figure, graph_card)
     canvas.get_tk_widget().pack(fill="both", expand=True)
+    ax.set_title("Gráfico de Trajetória")
+    ax.set_xlabel("Distância (m)")
+    ax.set_ylabel("Altura (m)")
+    ax.grid()
+    trajectory_plot = IncrementalLinePlot(canvas, ax, y_floor=0, label="Trajetória", color="blue")
+    ax.legend()
 
     # Card para informações
     info_card = tk.Frame(root, bg="#1e1e1e", relief="raised", bd=2)
@@ -209,13 +209,18 @@ def track_moving_object(video_path):
     root.grid_columnconfigure(0, weight=3)
     root.grid_columnconfigure(1, weight=1)
 
-    # Inicia a atualização do frame
+    # Inicia as threads de decodificação/detecção e a atualização do frame
+    pipeline.start()
     update_frame()
     root.mainloop()
 
-# Caminho do vídeo
-video_path = "video.mp4"
+# Caminho do vídeo e calibração (opcionais na linha de comando)
+parser = argparse.ArgumentParser(description="Rastreamento de um lançamento oblíquo com interface gráfica.")
+parser.add_argument("video", nargs="?", default="video.mp4", help="Caminho do vídeo, índice da câmera ou URL (rtsp://...)")
+add_calibration_arguments(parser)
+add_stream_arguments(parser)
+args = parser.parse_args()
 
 # Rastreamento do objeto em movimento
-track_moving_object(video_path)
+track_moving_object(args.video, **stream_options(args), **calibration_options(args))
 
@@ -0,0 +1,380 @@
+from collections import deque
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+
+# Função para ajustar os dados a uma parábola: y(x) = ax^2 + bx + c
+def parabola(x, a, b, c):
+    return a * x**2 + b * x + c
+
+
+def fit_parabola(coordenadas_x, coordenadas_y):
+    """
+    Ajusta y(x) = ax² + bx + c aos pontos da trajetória e deriva g, v0 e a distância total,
+    com as mesmas convenções de "Calcular coordenadas.py".
+    Retorna um dicionário com a, b, c, g, v0, distancia_total e a covariância 3x3 de (a, b, c).
+    """
+    parametros, covariancia = curve_fit(parabola, coordenadas_x, coordenadas_y)
+    a, b, c = parametros
+
+    g = -2 * a  # A aceleração (assumindo que a direção y segue a gravidade)
+    v0 = b      # A velocidade inicial no eixo x (assumindo lançamento horizontal)
+
+    # Distância percorrida (máxima posição x antes que y volte a 0), pela fórmula de Bhaskara
+    delta = b**2 - 4*a*c
+    distancia_total = (-b + np.sqrt(delta)) / (2*a) if delta >= 0 else np.nan
+
+    return {"a": a, "b": b, "c": c, "g": g, "v0": v0, "distancia_total": distancia_total, "covariancia": covariancia}
+
+
+class OnlineQuadraticFit:
+    """
+    Ajuste incremental por mínimos quadrados de y = ax² + bx + c.
+    Mantém só as somas de potências (estatísticas suficientes), então add/remove custam O(1)
+    e coefficients() resolve um sistema 3x3, sem reajustar todos os pontos com curve_fit.
+    Com window=N, os pontos mais antigos saem automaticamente da janela deslizante; a cada N saídas
+    as somas são refeitas a partir da janela, centradas na média de x, para não acumular erro.
+    """
+    def __init__(self, window=None):
+        self.window = window
+        self.points = deque()
+        self.evicted = 0    # Saídas desde a última reconstrução das somas
+        self.origin = None  # x é deslocado pelo primeiro ponto para manter o sistema bem condicionado
+        self.sums = np.zeros(5)   # Σu⁰ .. Σu⁴
+        self.cross = np.zeros(3)  # Σy, Σuy, Σu²y
+
+    def __len__(self):
+        return int(round(self.sums[0]))
+
+    def _accumulate(self, x, y, sign):
+        u = x - self.origin
+        u2 = u * u
+        self.sums += sign * np.array([1, u, u2, u2 * u, u2 * u2])
+        self.cross += sign * np.array([y, u * y, u2 * y])
+
+    def add(self, x, y):
+        if self.origin is None:
+            self.origin = x
+        self._accumulate(x, y, 1)
+        if self.window:
+            self.points.append((x, y))
+            if len(self.points) > self.window:
+                self._accumulate(*self.points.popleft(), -1)
+                self.evicted += 1
+                if self.evicted >= self.window:
+                    self._rebuild()
+
+    def remove(self, x, y):
+        """
+        Remove um ponto adicionado anteriormente. Com janela, o ponto também sai da janela
+        (ValueError se ele não estiver nela).
+        """
+        if self.window:
+            self.points.remove((x, y))
+        self._accumulate(x, y, -1)
+
+    def _rebuild(self):
+        """
+        Refaz as somas a partir dos pontos da janela, com a origem na média de x.
+        """
+        x, y = np.array(self.points, dtype=float).reshape(-1, 2).T
+        self.origin = x.mean() if len(x) else self.origin
+        powers = (x - self.origin) ** np.arange(5)[:, None]
+        self.sums = powers.sum(axis=1)
+        self.cross = powers[:3] @ y
+        self.evicted = 0
+
+    def coefficients(self):
+        """
+        Retorna (a, b, c) no sistema de coordenadas original, ou None se ainda não há pontos suficientes.
+        """
+        if len(self) < 3:
+            return None
+        s0, s1, s2, s3, s4 = self.sums
+        matrix = np.array([[s4, s3, s2],
+                           [s3, s2, s1],
+                           [s2, s1, s0]])
+        try:
+            alpha, beta, gamma = np.linalg.solve(matrix, self.cross[::-1])
+        except np.linalg.LinAlgError:
+            return None
+
+        # Converte de u = x - x0 de volta para x
+        x0 = self.origin
+        return alpha, beta - 2 * alpha * x0, alpha * x0**2 - beta * x0 + gamma
+
+
+class OnlineTrajectoryFit:
+    """
+    Mantém ao mesmo tempo os ajustes incrementais de y(x), x(t) e y(t) de uma trajetória
+    (y medido para cima), para exibir a, b, c, g, v0 e o ponto de pouso a cada frame.
+    """
+    def __init__(self, window=None):
+        self.y_of_x = OnlineQuadraticFit(window)
+        self.x_of_t = OnlineQuadraticFit(window)
+        self.y_of_t = OnlineQuadraticFit(window)
+        self.first_t = None
+        self.last_t = None
+
+    def add(self, t, x, y):
+        if self.first_t is None:
+            self.first_t = t
+        self.y_of_x.add(x, y)
+        self.x_of_t.add(t, x)
+        self.y_of_t.add(t, y)
+        self.last_t = t
+
+    def summary(self):
+        """
+        Retorna um dicionário com a, b, c, g, v0, angulo (graus), distancia_total e pouso_x,
+        ou None com menos de 3 pontos.
+        """
+        parabola_x = self.y_of_x.coefficients()
+        motion_x = self.x_of_t.coefficients()
+        motion_y = self.y_of_t.coefficients()
+        if parabola_x is None or motion_x is None or motion_y is None:
+            return None
+
+        a, b, c = parabola_x
+        delta = b**2 - 4*a*c
+        distancia_total = (-b + np.sqrt(delta)) / (2*a) if delta >= 0 and a != 0 else np.nan
+
+        ax, bx, cx = motion_x
+        ay, by, cy = motion_y
+        t0 = self.first_t
+        vx0 = 2 * ax * t0 + bx
+        vy0 = 2 * ay * t0 + by
+
+        # Pouso: maior raiz de y(t) = 0, levada em x(t)
+        pouso_x = np.nan
+        delta_t = by**2 - 4*ay*cy
+        if ay != 0 and delta_t >= 0:
+            t_land = max((-by + np.sqrt(delta_t)) / (2*ay), (-by - np.sqrt(delta_t)) / (2*ay))
+            pouso_x = parabola(t_land, ax, bx, cx)
+
+        return {"a": a, "b": b, "c": c, "g": -2 * ay, "v0": np.hypot(vx0, vy0),
+                "angulo": np.degrees(np.arctan2(vy0, vx0)), "distancia_total": distancia_total, "pouso_x": pouso_x}
+
+
+def estimate_noise(values):
+    """
+    Estima o desvio-padrão do ruído de uma série amostrada em sequência pela MAD das
+    segundas diferenças (insensível à curvatura constante de uma parábola e a saltos isolados).
+    """
+    second_diff = np.diff(np.asarray(values, dtype=float), 2)
+    if len(second_diff) == 0:
+        return 0.0
+    mad = np.median(np.abs(second_diff - np.median(second_diff)))
+    return 1.4826 * mad / np.sqrt(6)
+
+
+def savgol_derivatives(t, values, window=9, order=2):
+    """
+    Savitzky-Golay com os tempos reais de cada amostra: em cada ponto ajusta um polinômio de grau
+    `order` às `window` amostras vizinhas (janela deslocada nas bordas) e o avalia no instante do
+    ponto. Com amostragem uniforme é o filtro clássico; com frames faltando ou taxa variável, cada
+    janela usa os próprios intervalos. Todas as janelas são resolvidas de uma vez.
+    `values` tem formato (n,) ou (n, k). Retorna (posição, velocidade, aceleração) no mesmo
+    formato, em unidades de `values` por segundo (e por segundo²), ou NaN com até `order` amostras.
+    """
+    t = np.asarray(t, dtype=float)
+    values = np.asarray(values, dtype=float)
+    shape = values.shape
+    n = len(t)
+    if n <= order:
+        return tuple(np.full(shape, np.nan) for _ in range(3))
+    values = values.reshape(n, -1)
+    window = min(window, n)
+
+    # Índices das janelas (n, window), com as das bordas presas dentro da série
+    starts = np.clip(np.arange(n) - window // 2, 0, n - window)
+    index = starts[:, None] + np.arange(window)
+
+    # Tempos relativos ao ponto avaliado, em unidades do passo típico para o sistema ficar bem condicionado
+    step = np.median(np.diff(t)) or 1.0
+    V = ((t[index] - t[:, None]) / step)[:, :, None] ** np.arange(order + 1)
+    Vt = V.transpose(0, 2, 1)
+    coefficients = np.linalg.pinv(Vt @ V) @ (Vt @ values[index])
+
+    position = coefficients[:, 0]
+    velocity = coefficients[:, 1] / step
+    acceleration = 2 * coefficients[:, 2] / step**2 if order >= 2 else np.zeros_like(position)
+    return position.reshape(shape), velocity.reshape(shape), acceleration.reshape(shape)
+
+
+def _vandermonde(x):
+    x = np.asarray(x, dtype=float)
+    return np.stack([x**2, x, np.ones_like(x)], axis=-1)
+
+
+def _least_squares(x, y, weights=None):
+    V = _vandermonde(x)
+    if weights is None:
+        coefficients, *_ = np.linalg.lstsq(V, y, rcond=None)
+        return coefficients
+    # Equações normais ponderadas: um sistema 3x3 por iteração do IRLS
+    Vw = V * weights[:, None]
+    return np.linalg.solve(Vw.T @ V, Vw.T @ y)
+
+
+def _parabola_covariance(x, y, coefficients):
+    """
+    Covariância de (a, b, c) de um ajuste por mínimos quadrados, como a pcov do curve_fit.
+    """
+    V = _vandermonde(x)
+    residuals = y - V @ coefficients
+    dof = max(len(x) - 3, 1)
+    try:
+        return np.linalg.inv(V.T @ V) * (residuals @ residuals / dof)
+    except np.linalg.LinAlgError:
+        return np.full((3, 3), np.inf)
+
+
+def ransac_parabola(x, y, iterations=1000, threshold=None, sample_size=256, rng=None):
+    """
+    RANSAC vetorizado para y = ax² + bx + c. Sorteia `iterations` trios de pontos, resolve todos
+    os sistemas 3x3 de uma vez e pontua os modelos em lote numa subamostra de até sample_size
+    pontos. O melhor modelo é reajustado por mínimos quadrados nos inliers de todos os pontos.
+    Retorna ((a, b, c), máscara de inliers).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n < 3:
+        raise ValueError("São necessários pelo menos 3 pontos para ajustar uma parábola.")
+    rng = np.random.default_rng(rng)
+    if threshold is None:
+        threshold = max(3 * estimate_noise(y), 1e-9)
+
+    # Resolve todos os modelos candidatos de uma vez; trios degenerados (x repetido) são descartados
+    samples = np.array([rng.choice(n, 3, replace=False) for _ in range(iterations)]) if n < 8 \
+        else rng.integers(0, n, size=(iterations, 3))
+    V = _vandermonde(x[samples])
+    valid = np.abs(np.linalg.det(V)) > 1e-12
+    models = np.linalg.solve(V[valid], y[samples[valid]][..., None])[..., 0]
+    if len(models) == 0:
+        coefficients = _least_squares(x, y)
+        return coefficients, np.ones(n, dtype=bool)
+
+    subset = rng.choice(n, sample_size, replace=False) if n > sample_size else np.arange(n)
+    # Operações in-place: a matriz de resíduos (modelos x pontos) é o maior buffer da função
+    residuals = models @ _vandermonde(x[subset]).T
+    residuals -= y[subset]
+    np.abs(residuals, out=residuals)
+    np.minimum(residuals, threshold, out=residuals)
+    scores = residuals.sum(axis=1)  # Custo MSAC: inliers pesam pelo resíduo
+    best = models[np.argmin(scores)]
+
+    inliers = np.abs(_vandermonde(x) @ best - y) < threshold
+    if inliers.sum() >= 3:
+        best = _least_squares(x[inliers], y[inliers])
+        inliers = np.abs(_vandermonde(x) @ best - y) < threshold
+    return best, inliers
+
+
+def huber_parabola(x, y, delta=1.345, iterations=20, tol=1e-8):
+    """
+    Ajuste de y = ax² + bx + c com perda de Huber por mínimos quadrados iterativamente
+    reponderados (IRLS). A escala dos resíduos é reestimada pela MAD a cada iteração.
+    Retorna ((a, b, c), pesos finais).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    coefficients = _least_squares(x, y)
+    weights = np.ones_like(y)
+    V = _vandermonde(x)
+
+    for _ in range(iterations):
+        residuals = y - V @ coefficients
+        scale = 1.4826 * np.median(np.abs(residuals - np.median(residuals)))
+        if scale == 0:
+            break
+        r = np.abs(residuals) / (delta * scale)
+        weights = np.where(r <= 1, 1.0, 1.0 / np.maximum(r, 1e-12))
+        updated = _least_squares(x, y, weights)
+        if np.allclose(updated, coefficients, rtol=0, atol=tol):
+            coefficients = updated
+            break
+        coefficients = updated
+    return coefficients, weights
+
+
+def segment_flight(x, y, rest_tol=None, max_gap=2):
+    """
+    Separa a fase de voo dos trechos em repouso. Uma amostra está em movimento quando o
+    deslocamento ao longo de um trecho de `span` amostras centrado nela passa de rest_tol
+    (3x o ruído estimado). O trecho dobra a partir de 1 até que o deslocamento típico das amostras
+    em movimento fique bem acima do ruído, então trilhas densas (fps alto, milhares de pontos) não
+    são confundidas com repouso. Lacunas de até max(max_gap, span) amostras paradas dentro do voo
+    são toleradas. Retorna a máscara booleana do maior trecho contínuo em movimento.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n < 2:
+        return np.ones(n, dtype=bool)
+
+    if rest_tol is None:
+        rest_tol = max(3 * np.hypot(estimate_noise(x), estimate_noise(y)), 1e-9)
+    index = np.arange(n)
+
+    def displacement(span):
+        low = np.maximum(index - span // 2, 0)
+        high = np.minimum(low + span, n - 1)
+        return np.hypot(x[high] - x[low], y[high] - y[low])
+
+    # Menor trecho em que os 10% de amostras mais rápidas andam 3x a tolerância
+    span = 1
+    step = displacement(span)
+    while span < max(n // 4, 1) and np.percentile(step, 90) <= 3 * rest_tol:
+        span *= 2
+        step = displacement(span)
+    moving = step > rest_tol
+    max_gap = max(max_gap, span)
+
+    # Fecha lacunas curtas de amostras paradas entre dois trechos em movimento
+    edges = np.diff(np.concatenate([[0], moving.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return np.zeros(n, dtype=bool)
+    keep = np.concatenate([[True], starts[1:] - ends[:-1] > max_gap])
+    run_starts = starts[keep]
+    run_ends = np.concatenate([ends[:-1][keep[1:]], [ends[-1]]])
+
+    longest = np.argmax(run_ends - run_starts)
+    mask = np.zeros(n, dtype=bool)
+    # Inclui a amostra onde o último deslocamento termina
+    mask[run_starts[longest]:run_ends[longest] + 1] = True
+    return mask
+
+
+def fit_parabola_robust(coordenadas_x, coordenadas_y, method="ransac", segment=True, **options):
+    """
+    Versão robusta de fit_parabola: isola a fase de voo (segment_flight) e ajusta com RANSAC
+    ou Huber. Retorna o mesmo dicionário de fit_parabola com as máscaras "voo" e "inliers";
+    a covariância é a de mínimos quadrados nos inliers.
+    """
+    x = np.asarray(coordenadas_x, dtype=float)
+    y = np.asarray(coordenadas_y, dtype=float)
+    flight = segment_flight(x, y) if segment else np.ones(len(x), dtype=bool)
+    if flight.sum() < 3:
+        flight = np.ones(len(x), dtype=bool)
+
+    if method == "ransac":
+        (a, b, c), flight_inliers = ransac_parabola(x[flight], y[flight], **options)
+    elif method == "huber":
+        (a, b, c), weights = huber_parabola(x[flight], y[flight], **options)
+        flight_inliers = weights >= 0.5
+    else:
+        raise ValueError(f"Método de ajuste desconhecido: {method}")
+
+    inliers = np.zeros(len(x), dtype=bool)
+    inliers[np.flatnonzero(flight)[flight_inliers]] = True
+
+    delta = b**2 - 4*a*c
+    distancia_total = (-b + np.sqrt(delta)) / (2*a) if delta >= 0 and a != 0 else np.nan
+    covariancia = _parabola_covariance(x[inliers], y[inliers], np.array([a, b, c]))
+    return {"a": a, "b": b, "c": c, "g": -2 * a, "v0": b, "distancia_total": distancia_total,
+            "covariancia": covariancia, "voo": flight, "inliers": inliers}
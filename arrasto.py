@@ -0,0 +1,207 @@
+import argparse
+import time
+
+import numpy as np
+
+from trajetoria import open_trajectory
+
+# Arrasto quadrático: a = -k |v| v - g ŷ, com k = ρ·Cd·A / (2m) em 1/m
+G = 9.81
+
+
+def _acceleration(vx, vy, k, g):
+    speed = np.hypot(vx, vy)
+    return -k * speed * vx, -g - k * speed * vy
+
+
+def _rk4_step(x, y, vx, vy, h, k, g):
+    """
+    Um passo de RK4 para todas as trajetórias ao mesmo tempo (arrays de mesmo formato).
+    """
+    ax1, ay1 = _acceleration(vx, vy, k, g)
+    vx2, vy2 = vx + 0.5 * h * ax1, vy + 0.5 * h * ay1
+    ax2, ay2 = _acceleration(vx2, vy2, k, g)
+    vx3, vy3 = vx + 0.5 * h * ax2, vy + 0.5 * h * ay2
+    ax3, ay3 = _acceleration(vx3, vy3, k, g)
+    vx4, vy4 = vx + h * ax3, vy + h * ay3
+    ax4, ay4 = _acceleration(vx4, vy4, k, g)
+    return (x + h / 6 * (vx + 2 * vx2 + 2 * vx3 + vx4),
+            y + h / 6 * (vy + 2 * vy2 + 2 * vy3 + vy4),
+            vx + h / 6 * (ax1 + 2 * ax2 + 2 * ax3 + ax4),
+            vy + h / 6 * (ay1 + 2 * ay2 + 2 * ay3 + ay4))
+
+
+def simulate_drag(times, x0, y0, v0, angulo, k, g=G, substeps=4):
+    """
+    Posições (x, y para cima) de N lançamentos com arrasto quadrático nos instantes `times`.
+    `times` tem formato (T,) ou (N, T) e começa no instante do lançamento; os parâmetros são
+    escalares ou arrays (N,). Cada intervalo entre amostras é integrado com `substeps` passos
+    de RK4, então timestamps irregulares são respeitados. Instantes NaN (preenchimento de
+    séries mais curtas) congelam o estado. Retorna (x, y), cada um com formato (N, T).
+    """
+    params = np.broadcast_arrays(*(np.atleast_1d(np.asarray(value, dtype=float)) for value in (x0, y0, v0, angulo, k)))
+    times = np.asarray(times, dtype=float)
+    if times.ndim == 1:
+        times = np.broadcast_to(times, (len(params[0]), len(times)))
+    n, count = times.shape
+    x0, y0, v0, angulo, k = (np.broadcast_to(value, (n,)) for value in params)
+
+    theta = np.radians(angulo)
+    x, y = x0.copy(), y0.copy()
+    vx, vy = v0 * np.cos(theta), v0 * np.sin(theta)
+    xs = np.empty((n, count))
+    ys = np.empty((n, count))
+    xs[:, 0], ys[:, 0] = x, y
+
+    steps = np.nan_to_num(np.diff(times, axis=1)) / substeps
+    for index in range(count - 1):
+        h = steps[:, index]
+        for _ in range(substeps):
+            x, y, vx, vy = _rk4_step(x, y, vx, vy, h, k, g)
+        xs[:, index + 1], ys[:, index + 1] = x, y
+    return xs, ys
+
+
+def drag_metrics(v0, angulo, k, g=G, h0=0.0, dt=5e-3, max_time=60.0):
+    """
+    Alcance, altura máxima e tempo de voo com arrasto quadrático, para arrays de parâmetros
+    com broadcasting (por exemplo, uma varredura de v0 × ângulo × k). Integra todos os lançamentos
+    com passo fixo dt até o último tocar o solo, interpolando o instante do pouso.
+    Com k = 0 reproduz simulador.launch_metrics.
+    """
+    v0, angulo, k, g, h0 = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (v0, angulo, k, g, h0)))
+    shape = v0.shape
+    k, g, h0 = k.ravel(), g.ravel(), h0.ravel()
+    theta = np.radians(angulo.ravel())
+    x, y = np.zeros_like(h0), h0.copy()
+    vx, vy = v0.ravel() * np.cos(theta), v0.ravel() * np.sin(theta)
+
+    apex = h0.copy()
+    flight_range = np.full_like(h0, np.nan)
+    flight_time = np.full_like(h0, np.nan)
+    flying = np.ones(len(h0), dtype=bool)
+    t = 0.0
+    while flying.any() and t < max_time:
+        new_x, new_y, vx, vy = _rk4_step(x, y, vx, vy, dt, k, g)
+        t += dt
+        np.maximum(apex, new_y, out=apex)
+        landed = flying & (new_y < 0)
+        if landed.any():
+            fraction = y[landed] / (y[landed] - new_y[landed])
+            flight_time[landed] = t - dt + fraction * dt
+            flight_range[landed] = x[landed] + fraction * (new_x[landed] - x[landed])
+            flying &= ~landed
+        x, y = new_x, new_y
+
+    return {"alcance": flight_range.reshape(shape), "altura_max": apex.reshape(shape),
+            "tempo_voo": flight_time.reshape(shape)}
+
+
+def _initial_guess(t, x, y, g):
+    """
+    Chute inicial sem arrasto: x = x0 + vx t e y + g t²/2 = y0 + vy t, por mínimos quadrados.
+    """
+    V = np.stack([np.ones_like(t), t], axis=1)
+    (x0, vx), *_ = np.linalg.lstsq(V, x, rcond=None)
+    (y0, vy), *_ = np.linalg.lstsq(V, y + 0.5 * g * t**2, rcond=None)
+    return x0, y0, np.hypot(vx, vy), np.arctan2(vy, vx)
+
+
+def fit_drag_batch(times, xs, ys, g=G, k0=0.05, iterations=50, tol=1e-8, substeps=2):
+    """
+    Ajusta (x0, y0, v0, ângulo, k) de vários lançamentos de uma vez por Levenberg-Marquardt.
+    `times`, `xs` e `ys` são listas de séries (uma por lançamento, de tamanhos quaisquer).
+    Os jacobianos são diferenças finitas: o lançamento e suas 5 perturbações de cada série
+    são integrados juntos numa única chamada vetorizada de simulate_drag.
+    Retorna um dicionário de arrays (um valor por lançamento) com x0, y0, v0, angulo (graus),
+    k, rms (resíduo em metros) e convergiu. v0 e o ângulo são os do primeiro ponto de cada série.
+    """
+    count = len(times)
+    length = max(len(t) for t in times)
+    t_pad = np.full((count, length), np.nan)
+    x_pad = np.zeros((count, length))
+    y_pad = np.zeros((count, length))
+    mask = np.zeros((count, length), dtype=bool)
+    params = np.empty((count, 5))
+    for index, (t, x, y) in enumerate(zip(times, xs, ys)):
+        t, x, y = (np.asarray(values, dtype=float) for values in (t, x, y))
+        n = len(t)
+        t_pad[index, :n] = t - t[0]
+        x_pad[index, :n], y_pad[index, :n] = x, y
+        mask[index, :n] = True
+        params[index, :4] = _initial_guess(t - t[0], x, y, g)
+    params[:, 4] = k0
+    mask2 = np.concatenate([mask, mask], axis=1)
+
+    def residuals(p, t):
+        # p em radianos internamente; simulate_drag recebe graus
+        sim_x, sim_y = simulate_drag(t, p[:, 0], p[:, 1], p[:, 2], np.degrees(p[:, 3]), p[:, 4], g, substeps)
+        repeat = len(p) // count
+        r = np.concatenate([sim_x - np.repeat(x_pad, repeat, axis=0), sim_y - np.repeat(y_pad, repeat, axis=0)], axis=1)
+        r[~np.repeat(mask2, repeat, axis=0)] = 0
+        return r
+
+    t_jac = np.repeat(t_pad, 6, axis=0)
+    r = residuals(params, t_pad)
+    cost = np.einsum("ij,ij->i", r, r)
+    damping = np.full(count, 1e-3)
+    converged = np.zeros(count, dtype=bool)
+    eye = np.eye(5)
+
+    for _ in range(iterations):
+        # Base e 5 perturbações de cada lançamento, integradas juntas
+        steps = 1e-6 * np.maximum(np.abs(params), 1e-2)
+        perturbed = np.repeat(params[:, None, :], 6, axis=1)
+        perturbed[:, 1:, :] += steps[:, None, :] * eye
+        r_all = residuals(perturbed.reshape(-1, 5), t_jac).reshape(count, 6, -1)
+        jacobian = ((r_all[:, 1:] - r_all[:, :1]) / steps[:, :, None]).transpose(0, 2, 1)
+
+        A = jacobian.transpose(0, 2, 1) @ jacobian
+        gradient = np.einsum("bji,bj->bi", jacobian, r_all[:, 0])
+        diagonal = A[:, np.arange(5), np.arange(5)]
+        delta = -np.linalg.solve(A + damping[:, None, None] * diagonal[:, :, None] * eye + 1e-12 * eye,
+                                 gradient[:, :, None])[:, :, 0]
+
+        candidate = params + delta
+        candidate[:, 4] = np.maximum(candidate[:, 4], 0)  # Arrasto não negativo
+        r_new = residuals(candidate, t_pad)
+        new_cost = np.einsum("ij,ij->i", r_new, r_new)
+
+        improved = (new_cost < cost) & ~converged
+        converged |= improved & (cost - new_cost <= tol * np.maximum(cost, 1e-300))
+        params[improved] = candidate[improved]
+        cost = np.where(improved, new_cost, cost)
+        damping = np.where(improved, damping / 3, np.minimum(damping * 3, 1e10))
+        converged |= damping >= 1e10
+        if converged.all():
+            break
+
+    return {"x0": params[:, 0], "y0": params[:, 1], "v0": params[:, 2], "angulo": np.degrees(params[:, 3]),
+            "k": params[:, 4], "rms": np.sqrt(cost / np.maximum(2 * mask.sum(axis=1), 1)), "convergiu": converged}
+
+
+def fit_drag(t, x, y, g=G, **options):
+    """
+    Ajuste de um único lançamento; retorna o dicionário de fit_drag_batch com escalares.
+    """
+    result = fit_drag_batch([t], [x], [y], g=g, **options)
+    return {name: values[0] for name, values in result.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajusta um modelo com arrasto quadrático a uma trajetória .traj.")
+    parser.add_argument("trajetoria", help="Arquivo .traj gravado pelos rastreadores")
+    parser.add_argument("--g", type=float, default=G, help="Aceleração da gravidade em m/s²")
+    args = parser.parse_args()
+
+    _, trajectory = open_trajectory(args.trajetoria)
+    start = time.perf_counter()
+    fit = fit_drag(trajectory["t"], trajectory["x_m"], trajectory["y_m"], g=args.g)
+    elapsed = time.perf_counter() - start
+
+    print(f"v0: {fit['v0']:.4f} m/s | ângulo: {fit['angulo']:.2f}° | k: {fit['k']:.4f} 1/m")
+    print(f"Resíduo RMS: {fit['rms']:.4f} m | convergiu: {bool(fit['convergiu'])} | {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import argparse
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from ajuste import OnlineTrajectoryFit, fit_parabola_robust
+from rastreador import track_video_multi
+from rastreamento import track_video_headless
+
+# Casos padrão: variam um fator por vez em torno do caso base
+BASE_CASE = {"largura": 1280, "altura": 720, "fps": 60, "v0": 5.0, "angulo": 50.0, "g": 9.81,
+             "ruido": 0.0, "raio": 8, "fundo": 0.0, "semente": 0}
+DEFAULT_CASES = [
+    {},
+    {"largura": 640, "altura": 360, "fps": 30},
+    {"largura": 1920, "altura": 1080},
+    {"ruido": 3.0},
+    {"raio": 4},
+    {"raio": 16},
+    {"fundo": 1.0},
+    {"v0": 3.0, "angulo": 30.0},
+]
+RESULT_FIELDS = ["largura", "altura", "fps", "v0", "angulo", "ruido", "raio", "fundo", "frames", "deteccoes",
+                 "frames_por_s", "pico_memoria_mb", "erro_g_pct", "erro_v0_pct", "erro_angulo_graus", "trilhas"]
+# Trilhas sintéticas (pixels) com platôs em repouso para o ajuste robusto: a segmentação do voo
+# não pode depender da taxa de amostragem nem do número de pontos
+FLIGHT_CASES = [
+    {"fps": 30}, {"fps": 60}, {"fps": 120}, {"fps": 240},
+    {"fps": 240, "pontos": 10_000, "ruido": 5.0},
+]
+
+
+def ground_truth(t, v0, angulo, g, h0=0.0):
+    """
+    Posição (x, y para cima) e velocidade do modelo analítico do lançamento oblíquo,
+    o mesmo de calculate_trajectory e do Gráfico do Lançamento.
+    """
+    theta = np.radians(angulo)
+    vx, vy0 = v0 * np.cos(theta), v0 * np.sin(theta)
+    x = vx * t
+    y = h0 + vy0 * t - 0.5 * g * t**2
+    return x, y, np.full_like(t, vx), vy0 - g * t
+
+
+def render_launch_video(path, largura=1280, altura=720, fps=60, v0=5.0, angulo=50.0, g=9.81,
+                        ruido=0.0, raio=8, fundo=0.0, semente=0, margem=0.1):
+    """
+    Grava um vídeo sintético de uma bola em lançamento oblíquo sobre um fundo texturizado.
+    A escala (metros por pixel) é escolhida para que o voo ocupe a tela, descontando `margem`.
+    `ruido` é o desvio padrão do ruído do sensor (níveis de cinza) e `fundo` o deslocamento
+    horizontal do fundo em pixels por frame. Retorna (escala, número de frames).
+    """
+    rng = np.random.default_rng(semente)
+    theta = np.radians(angulo)
+    flight_time = 2 * v0 * np.sin(theta) / g
+    flight_range = v0 * np.cos(theta) * flight_time
+    apex = (v0 * np.sin(theta))**2 / (2 * g)
+    scale = max(flight_range / ((1 - 2 * margem) * largura), apex / ((1 - 2 * margem) * altura))
+    origin_x, ground_y = margem * largura, (1 - margem) * altura
+
+    # Textura suave e de baixo contraste, com largura extra para deslizar sem repetir bordas visíveis
+    texture = rng.normal(0, 1, (altura // 8 + 1, (largura + 64) // 8 + 1)).astype(np.float32)
+    texture = cv2.resize(texture, (largura + 64, altura), interpolation=cv2.INTER_CUBIC)
+    texture = np.clip(90 + 25 * texture, 0, 255).astype(np.uint8)
+    texture = np.tile(texture, (1, 2))
+
+    # Alguns frames parados depois do pouso, como num vídeo real
+    frame_count = int(np.ceil(flight_time * fps)) + 1 + fps // 4
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (largura, altura))
+    frame = np.empty((altura, largura, 3), dtype=np.uint8)
+    noise = np.empty((altura, largura, 3), dtype=np.int16)
+
+    for index in range(frame_count):
+        t = min(index / fps, flight_time)
+        x, y, _, _ = ground_truth(np.array(t), v0, angulo, g)
+        offset = int(round(index * fundo)) % (texture.shape[1] - largura)
+        cv2.cvtColor(texture[:, offset:offset + largura], cv2.COLOR_GRAY2BGR, dst=frame)
+        center = (int(round(origin_x + x / scale)), int(round(ground_y - y / scale)))
+        cv2.circle(frame, center, raio, (30, 30, 230), -1, lineType=cv2.LINE_AA)
+        if ruido:
+            noise[:] = rng.normal(0, ruido, noise.shape)
+            np.clip(frame + noise, 0, 255, out=noise)
+            frame[:] = noise
+        writer.write(frame)
+
+    writer.release()
+    return scale, frame_count
+
+
+def recover_launch(trajectory):
+    """
+    Ajusta x(t) e y(t) das detecções com o mesmo ajuste incremental dos dashboards.
+    Retorna (g, v0, ângulo em graus, instante da primeira detecção) ou None.
+    """
+    fit = OnlineTrajectoryFit()
+    for row in trajectory:
+        fit.add(row["t"], row["x_m"], row["y_m"])
+    summary = fit.summary()
+    if summary is None:
+        return None
+    return summary["g"], summary["v0"], summary["angulo"], trajectory["t"][0]
+
+
+def run_case(case, directory, roi=False):
+    """
+    Renderiza um caso, rastreia sem interface e compara o lançamento recuperado com o real.
+    O tempo é medido numa passada sem tracemalloc; o pico de memória, numa segunda passada.
+    Uma terceira passada com o MultiTargetTracker conta as trilhas, que devem ser exatamente uma.
+    """
+    params = {**BASE_CASE, **case}
+    path = os.path.join(directory, "sintetico_{largura}x{altura}_{fps}_{semente}.mp4".format(**params))
+    scale, frame_count = render_launch_video(path, **params)
+
+    start = time.perf_counter()
+    trajectory = track_video_headless(path, scale, roi=roi)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    track_video_headless(path, scale, roi=roi)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracks = len(np.unique(track_video_multi(path, scale)["track_id"]))
+
+    result = {key: params[key] for key in RESULT_FIELDS if key in params}
+    result.update(frames=frame_count, deteccoes=len(trajectory), frames_por_s=frame_count / elapsed,
+                  pico_memoria_mb=peak / 1e6, erro_g_pct=np.nan, erro_v0_pct=np.nan, erro_angulo_graus=np.nan,
+                  trilhas=tracks)
+
+    recovered = recover_launch(trajectory)
+    if recovered is not None:
+        g, v0, angulo, t_first = recovered
+        # O ajuste devolve a velocidade na primeira detecção; compara com o modelo nesse instante
+        _, _, vx, vy = ground_truth(np.array(t_first), params["v0"], params["angulo"], params["g"])
+        result.update(erro_g_pct=100 * (g - params["g"]) / params["g"],
+                      erro_v0_pct=100 * (v0 - np.hypot(vx, vy)) / np.hypot(vx, vy),
+                      erro_angulo_graus=angulo - np.degrees(np.arctan2(vy, vx)))
+    os.remove(path)
+    return result
+
+
+def run_flight_case(fps=60, pontos=None, ruido=1.0, vx=300.0, vy=486.0, g=972.0, repouso=40, semente=0):
+    """
+    Ajusta com fit_parabola_robust uma trilha sintética y(x) com `repouso` amostras paradas antes e
+    depois do voo, com e sem a segmentação. Com `pontos`, o voo é amostrado em `pontos` instantes
+    (independente de fps). Retorna o dicionário com o `a` real, os ajustados e as amostras do voo.
+    """
+    rng = np.random.default_rng(semente)
+    flight_time = 2 * vy / g
+    t = np.linspace(0, flight_time, pontos) if pontos else np.arange(0, flight_time, 1 / fps)
+    x = np.concatenate([np.zeros(repouso), vx * t, np.full(repouso, vx * t[-1])])
+    y = np.concatenate([np.zeros(repouso), vy * t - 0.5 * g * t**2, np.full(repouso, vy * t[-1] - 0.5 * g * t[-1]**2)])
+    x += rng.normal(0, ruido, len(x))
+    y += rng.normal(0, ruido, len(y))
+
+    start = time.perf_counter()
+    fit = fit_parabola_robust(x, y)
+    elapsed = time.perf_counter() - start
+    return {"fps": fps, "pontos": len(x), "ruido": ruido, "a": -g / (2 * vx**2), "a_segmentado": fit["a"],
+            "a_sem_segmentar": fit_parabola_robust(x, y, segment=False)["a"], "voo": int(fit["voo"].sum()),
+            "voo_real": len(t), "ms": elapsed * 1000}
+
+
+def print_flight_results(results):
+    header = (f"{'fps':>4} {'pontos':>6} {'ruído':>5} | {'a real':>9} {'a segm.':>9} {'a sem segm.':>11} | "
+              f"{'voo':>11} {'ms':>6}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['fps']:>4} {result['pontos']:>6} {result['ruido']:>5.2f} | {result['a']:>9.5f} "
+              f"{result['a_segmentado']:>9.5f} {result['a_sem_segmentar']:>11.5f} | "
+              f"{result['voo']:>5}/{result['voo_real']:<5} {result['ms']:>6.1f}")
+
+
+def run_benchmark(cases=DEFAULT_CASES, roi=False):
+    with tempfile.TemporaryDirectory() as directory:
+        return [run_case(case, directory, roi) for case in cases]
+
+
+def print_results(results):
+    header = (f"{'resolução':>10} {'fps':>4} {'v0':>4} {'θ':>4} {'ruído':>5} {'raio':>4} {'fundo':>5} | "
+              f"{'frames/s':>8} {'memória':>8} | {'erro g':>7} {'erro v0':>7} {'erro θ':>7} | {'trilhas':>7}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['largura']:>5}x{result['altura']:<4} {result['fps']:>4} {result['v0']:>4.1f} "
+              f"{result['angulo']:>4.0f} {result['ruido']:>5.1f} {result['raio']:>4} {result['fundo']:>5.1f} | "
+              f"{result['frames_por_s']:>8.1f} "
+              f"{result['pico_memoria_mb']:>6.1f}MB | {result['erro_g_pct']:>6.2f}% {result['erro_v0_pct']:>6.2f}% "
+              f"{result['erro_angulo_graus']:>6.2f}° | {result['trilhas']:>7}")
+
+
+def write_results(path, results):
+    with open(path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do rastreamento com vídeos sintéticos de lançamento oblíquo.")
+    parser.add_argument("--largura", type=int, help="Largura do vídeo em pixels")
+    parser.add_argument("--altura", type=int, help="Altura do vídeo em pixels")
+    parser.add_argument("--fps", type=int, help="Taxa de quadros do vídeo")
+    parser.add_argument("--v0", type=float, help="Velocidade inicial em m/s")
+    parser.add_argument("--angulo", type=float, help="Ângulo de lançamento em graus")
+    parser.add_argument("--g", type=float, help="Aceleração da gravidade em m/s²")
+    parser.add_argument("--ruido", type=float, help="Desvio padrão do ruído do sensor, em níveis de cinza")
+    parser.add_argument("--raio", type=int, help="Raio da bola em pixels")
+    parser.add_argument("--fundo", type=float, help="Movimento do fundo em pixels por frame")
+    parser.add_argument("--semente", type=int, help="Semente do gerador aleatório")
+    parser.add_argument("--roi", action="store_true", help="Usa o detector com janela adaptativa")
+    parser.add_argument("--saida", help="Arquivo CSV para salvar os resultados")
+    parser.add_argument("--ajuste", action="store_true",
+                        help="Roda só os casos do ajuste robusto com trilhas sintéticas (sem vídeo)")
+    args = parser.parse_args()
+
+    if args.ajuste:
+        results = [run_flight_case(**case) for case in FLIGHT_CASES]
+        print_flight_results(results)
+        # Com a segmentação, o ajuste deve concordar com o feito sobre todos os pontos
+        wrong = [result for result in results
+                 if abs(result["a_segmentado"] - result["a"]) > 0.05 * abs(result["a"])]
+        if wrong:
+            print(f"Atenção: {len(wrong)} caso(s) com o ajuste segmentado mais de 5% fora do real")
+        return
+
+    # Com qualquer parâmetro na linha de comando, roda só esse caso; senão, o conjunto padrão
+    case = {key: value for key, value in vars(args).items() if key in BASE_CASE and value is not None}
+    results = run_benchmark([case] if case else DEFAULT_CASES, roi=args.roi)
+    print_results(results)
+    # Uma bola deve dar uma única trilha; mais que isso indica fantasmas virando trilhas
+    extra = [result for result in results if result["trilhas"] != 1]
+    if extra:
+        print(f"Atenção: {len(extra)} caso(s) sem exatamente uma trilha no rastreamento de vários objetos")
+    if args.saida:
+        write_results(args.saida, results)
+        print(f"Resultados salvos em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
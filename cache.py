@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+from rastreamento import DETECTION_VERSION, KERNEL_SIZE, MIN_AREA, THRESHOLD, TRAJECTORY_DTYPE, track_frame_range
+from trajetoria import TrajectoryWriter, open_trajectory, video_hash
+
+DEFAULT_CACHE_DIR = os.environ.get("LANCAMENTO_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "lancamento_obliquo"))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Trava exclusiva entre processos (arquivo `path`.lock), para os processos do lote não
+    sobrescreverem as gravações uns dos outros nos JSON compartilhados.
+    """
+    with open(f"{path}.lock", "a+b") as lock_file:
+        if os.name == "nt":
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK desiste depois de 10 s; continua esperando
+                    continue
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def read_json(path):
+    try:
+        with open(path, encoding="utf-8") as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_json(path, key, value):
+    """
+    Grava path[key] = value relendo o arquivo sob a trava, sem perder as chaves gravadas ao
+    mesmo tempo por outros processos; a troca pelo arquivo novo é atômica.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with file_lock(path):
+        data = read_json(path)
+        data[key] = value
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as json_file:
+            json.dump(data, json_file, indent=2)
+        os.replace(temporary, path)
+
+
+class DetectionCache:
+    """
+    Cache em disco das detecções por frame e da calibração de cada vídeo.
+    As detecções são guardadas em .traj com escala 1 (posições em pixels), com chave formada
+    pelo hash do conteúdo do vídeo, pelos parâmetros e pela versão do detector; assim, mudar a escala, o
+    ajuste ou o gráfico não exige decodificar o vídeo de novo. O tamanho total é limitado
+    por max_bytes, removendo primeiro as entradas usadas há mais tempo (LRU pelo mtime).
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.hashes_path = os.path.join(directory, "hashes.json")
+        self.calibration_path = os.path.join(directory, "calibracao.json")
+
+    def video_hash(self, video_path):
+        """
+        Hash do conteúdo do vídeo, memorizado por caminho, tamanho e data de modificação
+        para não reler o arquivo inteiro a cada consulta.
+        """
+        stat = os.stat(video_path)
+        key = os.path.abspath(video_path)
+        entry = read_json(self.hashes_path).get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry["hash"]
+
+        digest = video_hash(video_path)
+        update_json(self.hashes_path, key, {"size": stat.st_size, "mtime": stat.st_mtime, "hash": digest})
+        return digest
+
+    def _entry_path(self, digest, params):
+        params_text = json.dumps(params, sort_keys=True)
+        key = hashlib.sha256(f"{digest}:{DETECTION_VERSION}:{params_text}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{key}.traj")
+
+    def get_detections(self, video_path, scale_factor, **params):
+        """
+        Retorna a trajetória em cache convertida para a escala pedida, ou None se não houver.
+        """
+        path = self._entry_path(self.video_hash(video_path), params)
+        try:
+            os.utime(path)  # Marca a entrada como usada recentemente
+            return self._load(path, scale_factor)
+        except FileNotFoundError:
+            # Ausente, ou removida por outro processo que compartilha o diretório
+            return None
+
+    def _load(self, path, scale_factor):
+        _, stored = open_trajectory(path)
+        trajectory = np.array(stored, dtype=TRAJECTORY_DTYPE)
+        trajectory["x_m"] *= scale_factor
+        trajectory["y_m"] *= scale_factor
+        return trajectory
+
+    def put_detections(self, video_path, scale_factor=1.0, **params):
+        """
+        Rastreia o vídeo (escala 1, em pixels) gravando direto na entrada do cache e aplica o limite de tamanho.
+        Retorna a trajetória gravada na escala pedida, lida antes de a entrada ficar visível para
+        outros processos (que podem removê-la ao aplicar o limite).
+        """
+        digest = self.video_hash(video_path)
+        path = self._entry_path(digest, params)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with TrajectoryWriter(temporary, TRAJECTORY_DTYPE, scale=1.0, source_hash=digest, **params) as writer:
+            track_frame_range(video_path, 1.0, 1, None, writer=writer, **params)
+        trajectory = self._load(temporary, scale_factor)
+        os.replace(temporary, path)
+        self.evict(keep=path)
+        return trajectory
+
+    def load_calibration(self, video_path):
+        """
+        Retorna o fator de escala (metros por pixel) salvo para o vídeo, ou None.
+        """
+        return read_json(self.calibration_path).get(self.video_hash(video_path))
+
+    def save_calibration(self, video_path, scale_factor):
+        update_json(self.calibration_path, self.video_hash(video_path), scale_factor)
+
+    def evict(self, keep=None):
+        """
+        Remove as entradas de detecção menos usadas até o cache caber em max_bytes.
+        A entrada `keep` (a recém-gravada) nunca é removida. Entradas que somem no meio do
+        caminho (removidas por outro processo do lote) são ignoradas.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".traj"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def track_video_cached(video_path, scale_factor, cache=None, threshold=THRESHOLD, kernel_size=KERNEL_SIZE, min_area=MIN_AREA, roi=False):
+    """
+    Igual a track_video_headless, mas reaproveita as detecções em cache quando o mesmo vídeo
+    já foi processado com os mesmos parâmetros do detector.
+    """
+    cache = cache or DetectionCache()
+    params = {"threshold": threshold, "kernel_size": kernel_size, "min_area": min_area, "roi": roi}
+    trajectory = cache.get_detections(video_path, scale_factor, **params)
+    if trajectory is None:
+        trajectory = cache.put_detections(video_path, scale_factor, **params)
+    return trajectory
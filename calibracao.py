@@ -0,0 +1,181 @@
+import os
+
+import cv2
+import numpy as np
+
+from cache import DEFAULT_CACHE_DIR, DetectionCache, read_json, update_json
+
+REFERENCE_DISTANCE = 1.5  # Distância real (m) da linha traçada na calibração com o mouse
+ENTER, ESC = 13, 27
+
+
+class CalibrationStore:
+    """
+    Escalas (metros por pixel) por câmera, em JSON, com o nome da câmera como chave.
+    Vale para todos os vídeos gravados com a mesma câmera e enquadramento.
+    """
+    def __init__(self, path=os.path.join(DEFAULT_CACHE_DIR, "cameras.json")):
+        self.path = path
+
+    def get(self, camera):
+        return read_json(self.path).get(camera)
+
+    def set(self, camera, scale_factor):
+        update_json(self.path, camera, scale_factor)
+
+
+def detect_checkerboard_scale(frame, pattern_size, square_size):
+    """
+    Escala a partir de um tabuleiro de xadrez visível no frame. pattern_size é o número de
+    cantos internos (colunas, linhas) e square_size o lado de uma casa em metros.
+    Retorna None se o tabuleiro não for encontrado.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    found, corners = cv2.findChessboardCorners(gray, pattern_size)
+    if not found:
+        return None
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+    corners = cv2.cornerSubPix(gray, corners, (5, 5), (-1, -1), criteria)
+    grid = corners.reshape(pattern_size[1], pattern_size[0], 2)
+
+    # Média dos lados de todas as casas, nas duas direções
+    spacing = np.concatenate([np.linalg.norm(np.diff(grid, axis=1), axis=2).ravel(),
+                              np.linalg.norm(np.diff(grid, axis=0), axis=2).ravel()])
+    return float(square_size / spacing.mean())
+
+
+def detect_aruco_scale(frame, marker_length, dictionary=None):
+    """
+    Escala a partir de marcadores ArUco de lado marker_length (metros). Retorna None se nenhum
+    marcador for encontrado ou se o OpenCV instalado não tiver o módulo aruco.
+    """
+    if not hasattr(cv2, "aruco"):
+        return None
+    dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50 if dictionary is None else dictionary)
+    detector = cv2.aruco.ArucoDetector(dictionary, cv2.aruco.DetectorParameters())
+    corners, ids, _ = detector.detectMarkers(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    if ids is None:
+        return None
+    sides = [np.linalg.norm(np.roll(marker[0], -1, axis=0) - marker[0], axis=1).mean() for marker in corners]
+    return float(marker_length / np.mean(sides))
+
+
+def calibrate_interactive(frame, real_distance=REFERENCE_DISTANCE):
+    """
+    Permite ao usuário selecionar com o mouse a distância entre dois pontos no frame.
+    Retorna a escala em metros por pixel com base em real_distance, ou None se cancelada (ESC).
+    A janela é atualizada pelos eventos do mouse e o laço bloqueia em waitKey(0) até uma tecla,
+    em vez de consultar o teclado a cada milissegundo.
+    """
+    def draw_line(event, x, y, flags, param):
+        nonlocal ref_points, drawing
+        if event == cv2.EVENT_LBUTTONDOWN:
+            ref_points = [(x, y)]
+            drawing = True
+        elif event == cv2.EVENT_LBUTTONUP and drawing:
+            ref_points.append((x, y))
+            drawing = False
+            frame_copy[:] = frame
+            cv2.line(frame_copy, ref_points[0], ref_points[1], (0, 255, 0), 2)
+            cv2.imshow("Calibração", frame_copy)
+
+    ref_points = []
+    drawing = False
+    frame_copy = frame.copy()
+
+    cv2.imshow("Calibração", frame_copy)
+    cv2.setMouseCallback("Calibração", draw_line)
+
+    # Aguarda o usuário finalizar a calibração (ENTER) ou cancelar (ESC)
+    while True:
+        key = cv2.waitKey(0) & 0xFF
+        if key == ENTER and len(ref_points) == 2:
+            break
+        if key == ESC or cv2.getWindowProperty("Calibração", cv2.WND_PROP_VISIBLE) < 1:
+            ref_points = []
+            break
+
+    cv2.destroyAllWindows()
+
+    if len(ref_points) == 2:
+        pixel_distance = np.linalg.norm(np.array(ref_points[0]) - np.array(ref_points[1]))
+        scale_factor = real_distance / pixel_distance
+        print(f"Distância em pixels: {pixel_distance:.2f} pixels")
+        print(f"Distância real: {real_distance:.2f} metros")
+        return scale_factor
+    print("Calibração falhou. Tente novamente.")
+    return None
+
+
+def resolve_scale(frame, video_path=None, scale_factor=None, camera=None, checkerboard=None, aruco=None,
+                  interactive=True, real_distance=REFERENCE_DISTANCE, cache=None, store=None):
+    """
+    Obtém a escala (metros por pixel) sem bloquear sempre que possível, nesta ordem:
+    valor explícito (ou LANCAMENTO_ESCALA), calibração salva do vídeo, calibração da câmera,
+    tabuleiro de xadrez (checkerboard = ((colunas, linhas), lado da casa)), marcador ArUco
+    (aruco = lado do marcador) e, por último, a seleção com o mouse se interactive=True.
+    Valores medidos são salvos para o vídeo e, com `camera`, para a câmera.
+    Retorna (escala, origem) ou (None, None).
+    """
+    if scale_factor is None and os.environ.get("LANCAMENTO_ESCALA"):
+        scale_factor = float(os.environ["LANCAMENTO_ESCALA"])
+    if scale_factor is not None:
+        return scale_factor, "valor informado"
+
+    cache = cache or DetectionCache()
+    store = store or CalibrationStore()
+    if video_path is not None:
+        scale_factor = cache.load_calibration(video_path)
+        if scale_factor is not None:
+            return scale_factor, "calibração salva do vídeo"
+    if camera is not None:
+        scale_factor = store.get(camera)
+        if scale_factor is not None:
+            return scale_factor, f"calibração da câmera {camera}"
+
+    source = None
+    if checkerboard is not None:
+        scale_factor = detect_checkerboard_scale(frame, *checkerboard)
+        source = "tabuleiro de xadrez"
+    if scale_factor is None and aruco is not None:
+        scale_factor = detect_aruco_scale(frame, aruco)
+        source = "marcador ArUco"
+    if scale_factor is None and interactive:
+        scale_factor = calibrate_interactive(frame, real_distance)
+        source = "seleção com o mouse"
+    if scale_factor is None:
+        return None, None
+
+    if video_path is not None:
+        cache.save_calibration(video_path, scale_factor)
+    if camera is not None:
+        store.set(camera, scale_factor)
+    return scale_factor, source
+
+
+def add_calibration_arguments(parser, interactive=True):
+    """
+    Opções de calibração comuns aos scripts; --distancia só existe com a seleção pelo mouse.
+    """
+    parser.add_argument("--escala", type=float, help="Fator de escala em metros por pixel (dispensa a calibração)")
+    parser.add_argument("--camera", help="Nome da câmera para reaproveitar/salvar a calibração")
+    parser.add_argument("--xadrez", help="Tabuleiro de referência: COLUNASxLINHAS:LADO (cantos internos, lado em m)")
+    parser.add_argument("--aruco", type=float, help="Lado do marcador ArUco de referência, em metros")
+    if interactive:
+        parser.add_argument("--distancia", type=float, default=REFERENCE_DISTANCE,
+                            help="Distância real, em metros, da linha traçada com o mouse")
+
+
+def calibration_options(args):
+    """
+    Converte as opções de add_calibration_arguments nos argumentos de resolve_scale.
+    """
+    checkerboard = None
+    if args.xadrez:
+        pattern, size = args.xadrez.split(":")
+        columns, rows = (int(value) for value in pattern.lower().split("x"))
+        checkerboard = ((columns, rows), float(size))
+    options = {"scale_factor": args.escala, "camera": args.camera, "checkerboard": checkerboard, "aruco": args.aruco}
+    if hasattr(args, "distancia"):
+        options["real_distance"] = args.distancia
+    return options
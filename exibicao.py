@@ -0,0 +1,95 @@
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class FrameDisplay:
+    """
+    Exibe frames BGR num tk.Label sem recriar imagens a cada frame. Um buffer RGBA
+    pré-alocado é compartilhado (sem cópia) com uma imagem PIL, e um único PhotoImage
+    é atualizado no lugar com paste(). Os buffers só são realocados quando o rótulo muda
+    de tamanho, no máximo uma vez por redimensionamento. Com display_fps, a exibição é
+    limitada a essa taxa, independente da taxa de análise.
+    """
+    def __init__(self, label, display_fps=None, fit_to_label=True):
+        self.label = label
+        self.display_fps = display_fps
+        self.fit_to_label = fit_to_label
+        self.min_interval = 1 / display_fps if display_fps else 0
+        self.last_shown = 0.0
+
+        self.target_size = None   # (largura, altura) em que os buffers foram alocados
+        self.label_size = None    # Último tamanho informado pelo evento <Configure>
+        self.resized = None
+        self.rgba = None
+        self.image = None
+        self.photo = None
+
+        self.allocations = 0      # Buffers/imagens criados desde o início
+        self.frames_shown = 0
+        self.frames_skipped = 0
+        label.bind("<Configure>", self._on_configure, add="+")
+
+    def _on_configure(self, event):
+        # Só registra o tamanho; a realocação acontece no próximo show()
+        self.label_size = (event.width, event.height)
+
+    def _display_size(self, frame_shape):
+        frame_h, frame_w = frame_shape[:2]
+        if not self.fit_to_label or self.label_size is None:
+            return frame_w, frame_h
+
+        # Desconta a borda do rótulo para a imagem não forçar o rótulo a crescer
+        border = 2 * (int(self.label.cget("borderwidth")) + int(self.label.cget("highlightthickness")))
+        label_w, label_h = self.label_size[0] - border, self.label_size[1] - border
+        if label_w < 2 or label_h < 2:
+            return frame_w, frame_h
+        scale = min(label_w / frame_w, label_h / frame_h)
+        return max(1, int(frame_w * scale)), max(1, int(frame_h * scale))
+
+    def _allocate(self, size, frame_shape):
+        width, height = size
+        self.rgba = np.empty((height, width, 4), dtype=np.uint8)
+        self.resized = None
+        if (width, height) != (frame_shape[1], frame_shape[0]):
+            self.resized = np.empty((height, width, 3), dtype=np.uint8)
+            self.allocations += 1
+        # A imagem PIL aponta para o mesmo buffer do array: atualizar o array atualiza a imagem.
+        # O PIL só compartilha memória em modos de 4 bytes por pixel, por isso RGBA e não RGB.
+        self.image = Image.frombuffer("RGBA", (width, height), self.rgba, "raw", "RGBA", 0, 1)
+        self.photo = ImageTk.PhotoImage(self.image)
+        self.label.configure(image=self.photo)
+        self.label.imgtk = self.photo
+        self.target_size = (width, height)
+        self.allocations += 3
+
+    def show(self, frame):
+        """
+        Exibe um frame BGR. Retorna False se o frame foi pulado pelo limite de display_fps.
+        """
+        now = time.perf_counter()
+        if self.min_interval and now - self.last_shown < self.min_interval:
+            self.frames_skipped += 1
+            return False
+        self.last_shown = now
+
+        size = self._display_size(frame.shape)
+        if size != self.target_size:
+            self._allocate(size, frame.shape)
+
+        source = frame
+        if self.resized is not None:
+            source = cv2.resize(frame, self.target_size, dst=self.resized, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(source, cv2.COLOR_BGR2RGBA, dst=self.rgba)
+        self.photo.paste(self.image)
+        self.frames_shown += 1
+        return True
+
+    def allocations_per_frame(self):
+        return self.allocations / self.frames_shown if self.frames_shown else 0.0
+
+    def stats_text(self):
+        return (f"Exibição: {self.frames_shown} frames, {self.frames_skipped} pulados | "
+                f"alocações/frame: {self.allocations_per_frame():.3f}")
@@ -0,0 +1,163 @@
+import numpy as np
+
+
+class GrowingArray:
+    """
+    Vetor float que cresce por duplicação de capacidade: append amortizado O(1) e
+    view() sem cópia dos dados já inseridos.
+    """
+    def __init__(self, capacity=1024):
+        self.data = np.empty(capacity)
+        self.size = 0
+
+    def append(self, value):
+        if self.size == len(self.data):
+            self.data = np.resize(self.data, 2 * len(self.data))
+        self.data[self.size] = value
+        self.size += 1
+
+    def view(self):
+        return self.data[:self.size]
+
+    def __len__(self):
+        return self.size
+
+
+def _expanded_limits(low, high, current, margin, floor=None):
+    """
+    Retorna novos limites se [low, high] sair de `current`, senão None. Só o lado ultrapassado
+    é estendido, com folga proporcional ao intervalo, para que a escala mude poucas vezes
+    ao longo da trajetória. Com `floor`, o limite inferior fica preso nele enquanto os dados
+    não descerem abaixo.
+    """
+    if current is None:
+        span = max(high - low, 0.05 * max(abs(low), abs(high)), 1e-6)
+        limits = [low - margin * span, high + margin * span]
+    else:
+        if current[0] <= low and high <= current[1]:
+            return None
+        span = max(max(high, current[1]) - min(low, current[0]), 1e-6)
+        limits = [low - margin * span if low < current[0] else current[0],
+                  high + margin * span if high > current[1] else current[1]]
+    if floor is not None and low >= floor:
+        limits[0] = floor
+    return tuple(limits)
+
+
+class IncrementalLinePlot:
+    """
+    Linha de trajetória desenhada por blitting. Os artistas são criados uma vez; a cada
+    render() só o trecho novo é desenhado sobre o fundo salvo (que já contém a linha
+    anterior), então o custo por frame não cresce com o tamanho da trajetória.
+    Os eixos só são reescalados (com redesenho completo) quando os pontos saem dos limites.
+    """
+    def __init__(self, canvas, ax, margin=0.5, y_floor=None, **line_options):
+        self.canvas = canvas
+        self.ax = ax
+        self.margin = margin
+        self.y_floor = y_floor
+        self.line, = ax.plot([], [], **line_options)
+        segment_options = {key: value for key, value in line_options.items() if key != "label"}
+        self.segment, = ax.plot([], [], animated=True, **segment_options)
+        self.x = GrowingArray()
+        self.y = GrowingArray()
+        self.drawn = 0
+        self.xlim = None
+        self.ylim = None
+        self.background = None
+        self.full_redraws = 0
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        # Todo redesenho completo (inclusive ao redimensionar a janela) renova o fundo
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.drawn = len(self.x)
+
+    def append(self, x, y):
+        self.x.append(x)
+        self.y.append(y)
+
+    def clear(self):
+        self.x = GrowingArray()
+        self.y = GrowingArray()
+        self.line.set_data([], [])
+        self.xlim = self.ylim = None
+        self.canvas.draw()
+
+    def render(self):
+        n = len(self.x)
+        if n == self.drawn or n < 2:
+            return
+
+        x, y = self.x.view(), self.y.view()
+        new_x, new_y = x[max(self.drawn - 1, 0):], y[max(self.drawn - 1, 0):]
+        xlim = _expanded_limits(new_x.min(), new_x.max(), self.xlim, self.margin)
+        ylim = _expanded_limits(new_y.min(), new_y.max(), self.ylim, self.margin, self.y_floor)
+
+        if xlim is not None or ylim is not None or self.background is None:
+            self.xlim = xlim or self.xlim
+            self.ylim = ylim or self.ylim
+            self.ax.set_xlim(*self.xlim)
+            self.ax.set_ylim(*self.ylim)
+            self.line.set_data(x, y)
+            self.full_redraws += 1
+            self.canvas.draw()
+            return
+
+        self.canvas.restore_region(self.background)
+        self.segment.set_data(new_x, new_y)
+        self.ax.draw_artist(self.segment)
+        self.canvas.blit(self.ax.bbox)
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        # A linha completa só é usada no próximo redesenho completo; set_data guarda a view sem copiar
+        self.line.set_data(x, y)
+        self.drawn = n
+
+
+class BlitCurve:
+    """
+    Curva substituída inteira a cada frame (por exemplo, a parábola prevista), redesenhada
+    por blitting sobre o fundo estático dos eixos. Reescala só quando os limites mudam.
+    """
+    def __init__(self, canvas, ax, margin=0.1, y_floor=None, **line_options):
+        self.canvas = canvas
+        self.ax = ax
+        self.margin = margin
+        self.y_floor = y_floor
+        self.line, = ax.plot([], [], animated=True, **line_options)
+        self.xlim = None
+        self.ylim = None
+        self.background = None
+        self.full_redraws = 0
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
+
+    def set_data(self, x, y):
+        x = np.asarray(x)
+        y = np.asarray(y)
+        self.line.set_data(x, y)
+
+        # Ao contrário da trajetória, a curva pode encolher: reescala se sair dos limites
+        # ou se passar a ocupar menos da metade deles
+        xlim = _expanded_limits(x.min(), x.max(), self.xlim, self.margin)
+        ylim = _expanded_limits(y.min(), y.max(), self.ylim, self.margin, self.y_floor)
+        if self.xlim is not None and (x.max() - x.min()) < 0.5 * (self.xlim[1] - self.xlim[0]):
+            xlim = _expanded_limits(x.min(), x.max(), None, self.margin)
+        if self.ylim is not None and (y.max() - y.min()) < 0.5 * (self.ylim[1] - self.ylim[0]):
+            ylim = _expanded_limits(y.min(), y.max(), None, self.margin, self.y_floor)
+
+        if xlim is not None or ylim is not None or self.background is None:
+            self.xlim = xlim or self.xlim
+            self.ylim = ylim or self.ylim
+            self.ax.set_xlim(*self.xlim)
+            self.ax.set_ylim(*self.ylim)
+            self.full_redraws += 1
+            self.canvas.draw()
+            return
+
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.bbox)
@@ -1,51 +1,21 @@
+import argparse
+import os
+import time
+
 import cv2
 import numpy as np
 import tkinter as tk
-from PIL import Image, ImageTk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-def calibrate_scale_with_mouse(frame):
-    """
-    Permite ao usuário selecionar com o mouse a distância entre dois pontos no frame.
-    Retorna a escala em metros por pixel com base na distância fixa de 1,5 metros.
-    """
-    def draw_line(event, x, y, flags, param):
-        nonlocal ref_points, drawing
-        if event == cv2.EVENT_LBUTTONDOWN:
-            ref_points = [(x, y)]
-            drawing = True
-        elif event == cv2.EVENT_LBUTTONUP and drawing:
-            ref_points.append((x, y))
-            drawing = False
-            cv2.line(frame_copy, ref_points[0], ref_points[1], (0, 255, 0), 2)
-            cv2.imshow("Calibração", frame_copy)
-
-    ref_points = []
-    drawing = False
-    frame_copy = frame.copy()
-
-    cv2.imshow("Calibração", frame_copy)
-    cv2.setMouseCallback("Calibração", draw_line)
-
-    # Aguarda o usuário finalizar a calibração
-    while True:
-        cv2.imshow("Calibração", frame_copy)
-        key = cv2.waitKey(1) & 0xFF
-        if key == 13 and len(ref_points) == 2:  # ENTER para finalizar
-            break
-
-    cv2.destroyAllWindows()
-
-    if len(ref_points) == 2:
-        pixel_distance = np.linalg.norm(np.array(ref_points[0]) - np.array(ref_points[1]))
-        real_distance = 1.5  # Define 1,5 metro como distância fixa
-        scale_factor = real_distance / pixel_distance
-        print(f"Distância em pixels: {pixel_distance:.2f} pixels")
-        print(f"Distância real: {real_distance:.2f} metros")
-        return scale_factor
-    print("Calibração falhou. Tente novamente.")
-    return None
+from ajuste import savgol_derivatives
+from calibracao import add_calibration_arguments, calibration_options, resolve_scale
+from exibicao import FrameDisplay
+from grafico import BlitCurve
+from perfil import PROFILER
+from pipeline import TrackingPipeline, add_stream_arguments, open_source, stream_options
+
+SAVGOL_WINDOW = 9  # Amostras por janela de Savitzky-Golay
 
 def calculate_trajectory(velocity):
     """
@@ -61,125 +31,135 @@ def calculate_trajectory(velocity):
     y = velocity * np.sin(angle) * t - 0.5 * g * t**2
     return x, y
 
-def track_moving_object(video_path):
-    def update_frame():
-        nonlocal prev_gray, total_distance, total_velocity, total_acceleration, object_positions, frame_tk
-
-        ret, frame = cap.read()
-        if not ret:
-            return
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-        # Calcula a diferença entre o frame atual e o anterior
-        frame_diff = cv2.absdiff(prev_gray, gray)
-        _, thresh = cv2.threshold(frame_diff, 10, 255, cv2.THRESH_BINARY)
+def track_moving_object(video_path, display_fps=None, replay=False, latency_budget=None, **calibration):
+    def process_detection(timestamp, detection):
+        nonlocal total_distance
 
-        # Aplica operações morfológicas para limpar ruídos
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-        thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+        # Centroide sub-pixel (momentos do contorno) no instante real do frame
+        _, _, (center_x, center_y) = detection
 
-        # Encontra contornos no frame de diferença
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if object_positions:
+            prev_x, prev_y = object_positions[-1]
+            distance = np.linalg.norm([center_x - prev_x, center_y - prev_y])
+            total_distance += distance
 
-        largest_contour = None
-        max_area = 0
+        object_positions.append((center_x, center_y))
+        object_times.append(timestamp)
 
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 20 and area > max_area:  # Filtra movimentos menores para capturar detalhes
-                max_area = area
-                largest_contour = contour
+    def update_kinematics():
+        nonlocal mean_velocity, mean_acceleration, settled, settled_speed, settled_acceleration
 
-        if largest_contour is not None:
-            (x, y, w, h) = cv2.boundingRect(largest_contour)
-            center_x, center_y = x + w // 2, y + h // 2
-
-            if object_positions:
-                prev_x, prev_y = object_positions[-1]
-                distance = np.linalg.norm([center_x - prev_x, center_y - prev_y])
-                total_distance += distance
-
-                velocity = distance / frame_time
-                velocities.append(velocity)
-                total_velocity += velocity
+        # Derivadas de Savitzky-Golay em vez de diferenças finitas, que amplificam o ruído de posição.
+        # Uma amostra nova só altera as estimativas das últimas SAVGOL_WINDOW amostras: só elas são
+        # recalculadas (com uma janela de contexto antes) e as anteriores ficam em somas acumuladas
+        n = len(object_times)
+        start = max(settled - SAVGOL_WINDOW, 0)
+        _, velocity, acceleration = savgol_derivatives(object_times[start:], object_positions[start:],
+                                                       window=SAVGOL_WINDOW)
+        if np.isnan(velocity).any():
+            return
+        speed = np.hypot(*velocity[settled - start:].T)
+        accel = np.hypot(*acceleration[settled - start:].T)
 
-                if len(velocities) > 1:
-                    acceleration = (velocities[-1] - velocities[-2]) / frame_time
-                    accelerations.append(acceleration)
-                    total_acceleration += abs(acceleration)
+        # Amostras fora das últimas SAVGOL_WINDOW não mudam mais
+        final = max(n - SAVGOL_WINDOW - settled, 0)
+        settled_speed += speed[:final].sum()
+        settled_acceleration += accel[:final].sum()
+        settled += final
+        mean_velocity = (settled_speed + speed[final:].sum()) / n
+        mean_acceleration = (settled_acceleration + accel[final:].sum()) / n
 
-            object_positions.append((center_x, center_y))
+    def update_frame():
+        # A detecção roda em outra thread e vê todos os frames; aqui só consumimos os resultados
+        new_detections = pipeline.poll_detections()
+        detected = False
+        for _, timestamp, detection, _ in new_detections:
+            if detection is not None:
+                process_detection(timestamp, detection)
+                detected = True
+        if detected:
+            update_kinematics()
+
+        latest = pipeline.latest_frame()
+        if latest is None:
+            if pipeline.finished:
+                dump_profile()
+                return
+            if not stop_flag:
+                root.after(5, update_frame)
+            return
 
+        _, frame, detection = latest
+        if detection is not None:
+            (x, y, w, h), _, _ = detection
             cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
 
-        prev_gray = gray
-
         # Conversões para métricas reais
         total_distance_m = total_distance * pixel_to_meter
-        total_velocity_mps = (total_velocity / len(velocities)) * pixel_to_meter if velocities else 0
-        total_acceleration_mps2 = (total_acceleration / len(accelerations)) * pixel_to_meter if accelerations else 0
+        total_velocity_mps = mean_velocity * pixel_to_meter
+        total_acceleration_mps2 = mean_acceleration * pixel_to_meter
 
         # Atualiza o gráfico com o lançamento oblíquo
-        if velocities:  # Garante que temos dados suficientes para plotar
+        if new_detections and mean_velocity:  # Garante que temos dados suficientes para plotar
+            # Troca só os dados da curva e redesenha por blitting; os limites só mudam quando necessário
             x_traj, y_traj = calculate_trajectory(total_velocity_mps)
-            ax.clear()
-            ax.plot(x_traj, y_traj, label="Trajetória (Parábola Invertida)", color="blue")
-            ax.set_title("Lançamento Oblíquo - Trajetória Parabólica", fontsize=14)
-            ax.set_xlabel("Distância Horizontal (m)", fontsize=12)
-            ax.set_ylabel("Altura (m)", fontsize=12)
-            ax.grid(True, linestyle='--', alpha=0.7)
-
-            # Ajusta os limites do gráfico
-            ax.set_xlim(0, max(x_traj))
-            ax.set_ylim(0, max(y_traj) + 1)
-            canvas.draw()
+            with PROFILER.stage("canvas_draw"):
+                trajectory_curve.set_data(x_traj, y_traj)
 
         # Atualiza o texto das informações
         info_text.set(f"Distância: {total_distance_m:.2f} m\n"
                       f"Velocidade: {total_velocity_mps:.2f} m/s\n"
-                      f"Aceleração: {total_acceleration_mps2:.2f} m/s²")
+                      f"Aceleração: {total_acceleration_mps2:.2f} m/s²\n\n"
+                      f"{pipeline.stats_text()}\n"
+                      f"{display.stats_text()}\n"
+                      f"{PROFILER.summary_text()}")
 
-        # Exibe o vídeo no rótulo
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame_pil = Image.fromarray(frame_rgb)
-        frame_tk = ImageTk.PhotoImage(image=frame_pil)
-        video_label.imgtk = frame_tk
-        video_label.configure(image=frame_tk)
+        # Exibe o vídeo no rótulo, reaproveitando o mesmo buffer e o mesmo PhotoImage a cada frame
+        with PROFILER.stage("tk_image"):
+            display.show(frame)
 
         if not stop_flag:
-            root.after(10, update_frame)
+            root.after(5, update_frame)
+
+    def dump_profile():
+        # Com LANCAMENTO_PERFIL ligado, grava a linha do tempo dos estágios ao lado do vídeo
+        if PROFILER.enabled:
+            PROFILER.dump(output_base + "_perfil.json")
 
     def on_close():
         nonlocal stop_flag
         stop_flag = True
+        pipeline.stop()
+        dump_profile()
         cap.release()
         root.destroy()
 
-    cap = cv2.VideoCapture(video_path)
+    # Arquivo, câmera (índice) ou fluxo RTSP; câmeras e fluxos usam os tempos de captura
+    cap, live = open_source(video_path, replay)
     ret, frame = cap.read()
     if not ret:
         print("Erro ao carregar o vídeo.")
         return
+    is_file = os.path.isfile(video_path)
+    output_base = os.path.splitext(video_path)[0] if is_file else time.strftime("ao_vivo_%Y%m%d_%H%M%S")
 
-    pixel_to_meter = calibrate_scale_with_mouse(frame)
+    # Escala informada, salva (vídeo ou câmera) ou medida num marcador; o mouse só em último caso
+    pixel_to_meter, source = resolve_scale(frame, video_path if is_file else None, **calibration)
     if pixel_to_meter is None:
         print("Calibração falhou. Encerrando.")
         return
+    print(f"Escala: {pixel_to_meter:.6f} m/pixel ({source})")
 
-    prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    pipeline = TrackingPipeline(cap, frame, live=live, latency_budget=latency_budget)
     object_positions = []
+    object_times = []
     total_distance = 0
-    total_velocity = 0
-    total_acceleration = 0
-
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_time = 1 / fps
-    velocities = []
-    accelerations = []
+    mean_velocity = 0
+    mean_acceleration = 0
+    settled = 0  # Amostras cujas derivadas já não mudam, somadas em settled_speed/settled_acceleration
+    settled_speed = 0.0
+    settled_acceleration = 0.0
     stop_flag = False
-    frame_tk = None  # Adiciona a variável frame_tk para manter a referência
 
     # Configurações da janela
     root = tk.Tk()
@@ -196,6 +176,7 @@ def track_moving_object(video_path):
     # Card para o vídeo
     video_label = tk.Label(root, bg="#1c1c1c")
     video_label.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+    display = FrameDisplay(video_label, display_fps)
 
     # Card para o gráfico
     figure = plt.Figure(figsize=(5, 4), dpi=100)
@@ -210,6 +191,11 @@ def track_moving_object(video_path):
     ax.tick_params(axis='y', colors='white')
     canvas = FigureCanvasTkAgg(figure, root)
     canvas.get_tk_widget().grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
+    ax.set_title("Lançamento Oblíquo - Trajetória Parabólica", fontsize=14)
+    ax.set_xlabel("Distância Horizontal (m)", fontsize=12)
+    ax.set_ylabel("Altura (m)", fontsize=12)
+    ax.grid(True, linestyle='--', alpha=0.7)
+    trajectory_curve = BlitCurve(canvas, ax, y_floor=0, label="Trajetória (Parábola Invertida)", color="blue")
 
     # Card para dados finais
     info_text = tk.StringVar()
@@ -220,12 +206,17 @@ def track_moving_object(video_path):
     close_button = tk.Button(root, text="Fechar", command=on_close, font=("Arial", 14), bg="#e74c3c", fg="white")
     close_button.grid(row=1, column=1, padx=10, pady=10, sticky="nsew")
 
-    # Atualiza o frame
+    # Inicia as threads de decodificação/detecção e atualiza o frame
+    pipeline.start()
     update_frame()
     root.mainloop()
 
-# Caminho do vídeo
-video_path = "video.mp4"
+# Caminho do vídeo e calibração (opcionais na linha de comando)
+parser = argparse.ArgumentParser(description="Rastreamento de um lançamento oblíquo com interface gráfica.")
+parser.add_argument("video", nargs="?", default="video.mp4", help="Caminho do vídeo, índice da câmera ou URL (rtsp://...)")
+add_calibration_arguments(parser)
+add_stream_arguments(parser)
+args = parser.parse_args()
 
 # Rastreamento do objeto em movimento
-track_moving_object(video_path)
+track_moving_object(args.video, **stream_options(args), **calibration_options(args))
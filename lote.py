@@ -0,0 +1,143 @@
+import argparse
+import csv
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from ajuste import fit_parabola
+from cache import DetectionCache, track_video_cached
+from calibracao import add_calibration_arguments, calibration_options, resolve_scale
+from rastreamento import track_video_headless
+from trajetoria import save_trajectory
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+SUMMARY_FIELDS = ["video", "frames", "escala", "deteccoes", "a", "b", "c", "g", "v0", "distancia_total", "segundos"]
+
+
+def find_videos(patterns):
+    """
+    Expande diretórios e padrões glob em uma lista ordenada de caminhos de vídeo.
+    """
+    videos = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for name in sorted(os.listdir(pattern)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(pattern, name))
+        else:
+            videos.extend(sorted(glob.glob(pattern)))
+    return videos
+
+
+def analyze_video(video_path, scale_factor, output_dir, use_cache=True, calibration=None):
+    """
+    Rastreia um vídeo, salva a trajetória em output_dir e ajusta a parábola.
+    Executado em um processo do pool; retorna uma linha da tabela de resumo (sem os campos do
+    ajuste quando ele falha).
+    Com use_cache, as detecções de uma execução anterior são reaproveitadas.
+    Sem scale_factor, a escala vem da calibração salva do vídeo ou da câmera, ou de um marcador
+    no primeiro frame (opções em `calibration`), nunca da seleção com o mouse.
+    """
+    start = time.perf_counter()
+
+    cap = cv2.VideoCapture(video_path)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if scale_factor is None:
+        ret, frame = cap.read()
+        if ret:
+            scale_factor, _ = resolve_scale(frame, video_path, interactive=False, **(calibration or {}))
+    cap.release()
+    if scale_factor is None:
+        raise ValueError("sem calibração (use --escala, --camera, --xadrez ou --aruco)")
+
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    output_path = os.path.join(output_dir, f"{name}.traj")
+    if use_cache:
+        cache = DetectionCache()
+        trajectory = track_video_cached(video_path, scale_factor, cache)
+        save_trajectory(output_path, trajectory, scale=scale_factor, source_hash=cache.video_hash(video_path))
+    else:
+        trajectory = track_video_headless(video_path, scale_factor, output_path=output_path)
+
+    row = {"video": video_path, "frames": frames, "escala": scale_factor, "deteccoes": len(trajectory)}
+    if len(trajectory) >= 3:
+        # A trajetória já foi salva: se o ajuste não convergir, a linha fica com os campos vazios
+        try:
+            row.update(fit_parabola(trajectory["x_m"], trajectory["y_m"]))
+        except (RuntimeError, ValueError) as error:
+            print(f"Ajuste falhou em {video_path}: {error}")
+    row["segundos"] = time.perf_counter() - start
+    return row
+
+
+def run_batch(videos, scale_factor, output_dir, workers=None, use_cache=True, calibration=None):
+    """
+    Distribui os vídeos entre os processos e retorna as linhas do resumo na ordem de entrada.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    rows = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(analyze_video, video, scale_factor, output_dir, use_cache, calibration): video
+                   for video in videos}
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                rows[video] = future.result()
+            except Exception as error:
+                print(f"Falha ao processar {video}: {error}")
+    return [rows[video] for video in videos if video in rows]
+
+
+def write_summary(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as summary_file:
+        writer = csv.DictWriter(summary_file, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Análise em lote de vídeos de lançamento oblíquo.")
+    parser.add_argument("videos", nargs="+", help="Diretórios ou padrões glob de vídeos")
+    add_calibration_arguments(parser, interactive=False)
+    parser.add_argument("--saida", default="resultados", help="Diretório para as trajetórias e o resumo")
+    parser.add_argument("--processos", type=int, default=None, help="Número de processos (padrão: núcleos da CPU)")
+    parser.add_argument("--sem-cache", action="store_true", help="Ignora o cache de detecções e processa tudo de novo")
+    args = parser.parse_args()
+
+    videos = find_videos(args.videos)
+    if not videos:
+        print("Nenhum vídeo encontrado.")
+        return
+
+    workers = args.processos or os.cpu_count() or 1
+    start = time.perf_counter()
+    calibration = calibration_options(args)
+    scale_factor = calibration.pop("scale_factor")
+    rows = run_batch(videos, scale_factor, args.saida, workers, use_cache=not args.sem_cache, calibration=calibration)
+    elapsed = time.perf_counter() - start
+
+    summary_path = os.path.join(args.saida, "resumo.csv")
+    write_summary(rows, summary_path)
+
+    print(f"{'Vídeo':<30} {'g':>10} {'v0':>10} {'Distância':>10}")
+    for row in rows:
+        print(f"{os.path.basename(row['video']):<30} {row.get('g', np.nan):>10.4f} "
+              f"{row.get('v0', np.nan):>10.4f} {row.get('distancia_total', np.nan):>10.4f}")
+
+    total_frames = sum(row["frames"] for row in rows)
+    worker_seconds = sum(row["segundos"] for row in rows)
+    print(f"\nResumo salvo em {summary_path}")
+    print(f"Vídeos processados: {len(rows)} em {elapsed:.2f} s ({len(rows) / elapsed * 60:.1f} vídeos/min)")
+    if worker_seconds > 0:
+        print(f"Frames/s por processo: {total_frames / worker_seconds:.1f} ({workers} processos)")
+
+
+if __name__ == "__main__":
+    main()
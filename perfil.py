@@ -0,0 +1,170 @@
+import csv
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+
+class _NullStage:
+    """
+    Contexto vazio devolvido quando o perfilador está desligado.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.tracking = profiler.track_allocations
+        if self.tracking:
+            # O pico do tracemalloc é do processo todo: medindo alocações, os estágios de todas as
+            # threads se revezam (um por vez) e só os da thread escolhida registram bytes
+            profiler.exclusive.acquire()
+            thread = profiler.allocation_thread
+            self.measuring = thread is None or threading.current_thread().name == thread
+            if self.measuring:
+                tracemalloc.reset_peak()
+                self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        allocated = 0
+        if self.tracking:
+            # Pico acima do início do estágio: aproxima os bytes temporários alocados nele
+            allocated = tracemalloc.get_traced_memory()[1] - self.memory_start if self.measuring else None
+            self.profiler.exclusive.release()
+        self.profiler.record(self.name, elapsed, allocated)
+        return False
+
+
+class StageProfiler:
+    """
+    Mede o tempo (e, opcionalmente, a memória alocada) de cada estágio do rastreamento:
+    decodificação, absdiff/threshold, morfologia, findContours, gráfico e imagem do Tk.
+    Guarda janelas recentes para p50/p95/p99 e uma linha do tempo dos últimos timeline_limit
+    eventos que pode ser exportada em JSON ou CSV. Desligado, stage() devolve um contexto vazio
+    compartilhado. Medindo alocações, os estágios não rodam em paralelo; com várias threads,
+    measure_allocations_on escolhe a única que mede bytes e as outras ficam sem (None).
+    """
+    def __init__(self, enabled=False, window=300, track_allocations=False, timeline_limit=100_000):
+        self.window = window
+        self.timeline_limit = timeline_limit
+        self.lock = threading.Lock()
+        self.exclusive = threading.RLock()  # Um estágio por vez enquanto mede alocações
+        self.enabled = False
+        self.track_allocations = False
+        self.allocation_thread = None  # Nome da thread que mede as alocações (None: qualquer uma)
+        self.reset()
+        if enabled:
+            self.enable(track_allocations)
+
+    def reset(self):
+        with self.lock:
+            self.samples = {}
+            self.allocations = {}
+            self.timeline = deque(maxlen=self.timeline_limit)
+            self.origin = time.perf_counter()
+
+    def enable(self, track_allocations=False):
+        self.track_allocations = track_allocations
+        if track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.track_allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.track_allocations = False
+
+    def measure_allocations_on(self, thread_name):
+        """
+        Restringe a medida de alocações aos estágios da thread `thread_name`.
+        """
+        self.allocation_thread = thread_name
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, seconds, allocated=0):
+        with self.lock:
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.window)
+                self.allocations[name] = deque(maxlen=self.window)
+            self.samples[name].append(seconds)
+            if allocated is not None:
+                self.allocations[name].append(allocated)
+            self.timeline.append((time.perf_counter() - self.origin - seconds, threading.current_thread().name,
+                                  name, seconds * 1000, allocated))
+
+    def percentiles(self, name):
+        """
+        Retorna (p50, p95, p99) em milissegundos da janela recente do estágio.
+        """
+        with self.lock:
+            samples = np.array(self.samples.get(name, ()))
+        if len(samples) == 0:
+            return 0.0, 0.0, 0.0
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+        return p50, p95, p99
+
+    def summary_text(self):
+        if not self.enabled:
+            return ""
+        lines = ["Estágio: p50 / p95 / p99 (ms)"]
+        if self.track_allocations and self.allocation_thread is not None:
+            lines[0] += f" | KiB na thread {self.allocation_thread}, estágios um por vez"
+        for name in list(self.samples):
+            p50, p95, p99 = self.percentiles(name)
+            line = f"{name}: {p50:.2f} / {p95:.2f} / {p99:.2f}"
+            if self.track_allocations:
+                with self.lock:
+                    allocated = np.mean(self.allocations[name]) if self.allocations[name] else None
+                if allocated is not None:
+                    line += f" | {allocated / 1024:.0f} KiB"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """
+        Exporta a linha do tempo (início em s, thread, estágio, duração em ms, bytes) em JSON ou CSV,
+        conforme a extensão do arquivo.
+        """
+        with self.lock:
+            timeline = list(self.timeline)
+        fields = ["inicio_s", "thread", "estagio", "duracao_ms", "bytes"]
+
+        if os.path.splitext(path)[1].lower() == ".csv":
+            with open(path, "w", newline="", encoding="utf-8") as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(fields)
+                writer.writerows(timeline)
+        else:
+            summary = {name: dict(zip(("p50", "p95", "p99"), map(float, self.percentiles(name)))) for name in self.samples}
+            with open(path, "w", encoding="utf-8") as json_file:
+                json.dump({"resumo_ms": summary, "eventos": [dict(zip(fields, event)) for event in timeline]},
+                          json_file, ensure_ascii=False)
+
+
+# Perfilador compartilhado pelos módulos; ligado com LANCAMENTO_PERFIL=1 (ou =memoria para medir alocações)
+_mode = os.environ.get("LANCAMENTO_PERFIL", "")
+PROFILER = StageProfiler(enabled=bool(_mode) and _mode != "0", track_allocations=_mode == "memoria")
@@ -0,0 +1,440 @@
+import argparse
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from perfil import PROFILER
+from rastreador import BallisticTracker
+from rastreamento import detect_contours, detect_largest_contour, frame_timestamp, make_kernel
+
+
+def open_source(source, replay=False):
+    """
+    Abre um arquivo de vídeo, uma câmera (índice, como "0") ou um fluxo de rede (rtsp://, http://).
+    Com replay=True o arquivo é reproduzido no ritmo real, como uma câmera (ReplayCapture).
+    Retorna (captura, ao_vivo).
+    """
+    if isinstance(source, int) or str(source).isdigit():
+        return cv2.VideoCapture(int(source)), True
+    if replay:
+        return ReplayCapture(source), True
+    return cv2.VideoCapture(source), "://" in str(source)
+
+
+class ReplayCapture:
+    """
+    Substituto local de uma câmera ao vivo: grab() só libera cada frame no seu instante
+    (CAP_PROP_POS_MSEC dividido por `speed`, medido a partir do primeiro frame) e CAP_PROP_FPS
+    vale 0, como em muitas câmeras e fluxos RTSP. Com speed > 1 simula uma fonte mais rápida
+    que o detector, para testar o orçamento de latência. O próximo frame é decodificado em
+    retrieve(), então a espera fica só no grab(), como numa câmera.
+    """
+    def __init__(self, path, speed=1.0):
+        self.cap = cv2.VideoCapture(path)
+        self.speed = speed
+        self.start = None
+        self.ahead = None       # (frame, ms) decodificado e ainda não entregue
+        self.position_ms = 0.0  # CAP_PROP_POS_MSEC do último frame entregue
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def grab(self):
+        """
+        Espera o instante do próximo frame, como a espera de uma câmera.
+        """
+        if self.ahead is None:
+            self._decode_next()
+            if self.ahead is None:
+                return False
+        media_time = self.ahead[1] / 1000 / self.speed
+        if self.start is None:
+            self.start = time.perf_counter() - media_time
+        delay = self.start + media_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    def retrieve(self):
+        frame, self.position_ms = self.ahead
+        self._decode_next()
+        return True, frame
+
+    def _decode_next(self):
+        ret, frame = self.cap.read()
+        self.ahead = (frame, self.cap.get(cv2.CAP_PROP_POS_MSEC)) if ret else None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return 0.0
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self.position_ms
+        return self.cap.get(prop)
+
+    def release(self):
+        self.cap.release()
+
+
+class PipelineStats:
+    """
+    Estatísticas de tempo por frame e profundidade das filas do pipeline.
+    Cada estágio guarda os últimos `window` intervalos para calcular o FPS recente.
+    """
+    def __init__(self, window=120):
+        self.lock = threading.Lock()
+        self.frame_times = {stage: deque(maxlen=window) for stage in ("decode", "detect", "render")}
+        self.latencies = deque(maxlen=window)
+        self.last_tick = {}
+        self.counts = {"decoded": 0, "detected": 0, "rendered": 0, "dropped": 0, "overwritten": 0, "skipped": 0}
+
+    def tick(self, stage):
+        now = time.perf_counter()
+        with self.lock:
+            last = self.last_tick.get(stage)
+            if last is not None:
+                self.frame_times[stage].append(now - last)
+            self.last_tick[stage] = now
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counts[name] += n
+
+    def fps(self, stage):
+        with self.lock:
+            times = self.frame_times[stage]
+            if not times:
+                return 0.0
+            return len(times) / sum(times)
+
+    def mean_frame_time(self, stage):
+        with self.lock:
+            times = self.frame_times[stage]
+            return sum(times) / len(times) if times else 0.0
+
+    def add_latency(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def latency(self):
+        """
+        Retorna (p50, p95, máximo) em milissegundos da latência recente entre a captura de um
+        frame e a entrega do seu resultado, ou None se ainda não houver resultados.
+        """
+        with self.lock:
+            latencies = np.array(self.latencies)
+        if len(latencies) == 0:
+            return None
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        return p50, p95, latencies.max() * 1000
+
+
+class TrackingPipeline:
+    """
+    Pipeline produtor/consumidor: uma thread decodifica, outra detecta e a interface Tk
+    renderiza. A detecção recebe todos os frames (fila bloqueante), enquanto a fila de
+    exibição descarta frames antigos para a tela acompanhar o FPS da fonte.
+    Se um tracker (BallisticTracker) for passado, ele recebe todos os contornos de cada frame
+    e o estado suavizado acompanha cada detecção.
+
+    O tempo de cada frame é o CAP_PROP_POS_MSEC da fonte. Com uma fonte ao vivo (live; por padrão,
+    quando CAP_PROP_FPS é 0), se ela não informar o tempo vale o relógio da captura, e a fila de
+    decodificação vira um buffer circular: a leitura nunca espera pela detecção e os frames mais
+    antigos são sobrescritos. Com latency_budget (segundos), um frame que já chegaria atrasado ao
+    resultado é pulado pela detecção se houver outro mais novo na fila, em vez de o pipeline
+    acumular atraso.
+    """
+    def __init__(self, cap, first_frame, queue_size=8, display_queue_size=2, realtime=True, tracker=None,
+                 live=None, latency_budget=None):
+        self.cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.frame_time = 1 / self.fps if self.fps > 0 else 0
+        self.live = self.fps <= 0 if live is None else live
+        self.latency_budget = latency_budget
+        self.tracker = tracker
+        self.realtime = realtime
+        self.kernel = make_kernel()
+        self.prev_gray = cv2.cvtColor(first_frame, cv2.COLOR_BGR2GRAY)
+        # O primeiro frame (já lido por quem criou o pipeline) é o instante zero
+        self.origin = time.perf_counter()
+        self.media_origin = max(cap.get(cv2.CAP_PROP_POS_MSEC), 0.0)
+        self.last_timestamp = 0.0
+        self.detect_cost = 0.0
+
+        self.decode_queue = queue.Queue(maxsize=queue_size)
+        self.display_queue = queue.Queue(maxsize=display_queue_size)
+        self.detections = queue.Queue()
+        self.stats = PipelineStats()
+        # Com LANCAMENTO_PERFIL=memoria, só os estágios do detector medem bytes por frame
+        PROFILER.measure_allocations_on("detector")
+
+        self.stop_event = threading.Event()
+        self.decoder_done = threading.Event()
+        self.detector_done = threading.Event()
+        self.threads = [
+            threading.Thread(target=self._decode_loop, name="decodificador", daemon=True),
+            threading.Thread(target=self._detect_loop, name="detector", daemon=True),
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=1)
+
+    @property
+    def finished(self):
+        return self.detector_done.is_set() and self.display_queue.empty() and self.detections.empty()
+
+    def _put(self, q, item):
+        # Bloqueia enquanto a fila estiver cheia, mas sem ignorar um pedido de parada
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_loop(self):
+        frame_time = self.frame_time
+        start = time.perf_counter()
+        frame_index = 0
+
+        while not self.stop_event.is_set():
+            if self.live:
+                # grab() espera o próximo frame da fonte (câmera, fluxo ou o ritmo do ReplayCapture);
+                # o estágio "decode" mede só o retrieve(), que decodifica, e não essa espera
+                ret = self.cap.grab()
+                if ret:
+                    with PROFILER.stage("decode"):
+                        ret, frame = self.cap.retrieve()
+            else:
+                with PROFILER.stage("decode"):
+                    ret, frame = self.cap.read()
+            capture_time = time.perf_counter()
+            if not ret:
+                break
+            frame_index += 1
+            self.stats.tick("decode")
+            self.stats.count("decoded")
+
+            if self.live:
+                # A fonte dita o ritmo: nunca bloqueia a leitura, sobrescreve o frame mais antigo.
+                # O tempo é o da própria fonte (PTS do fluxo) quando ela informa; senão, o da captura
+                media_time = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+                timestamp = (media_time - self.media_origin) / 1000 if media_time > 0 else capture_time - self.origin
+                self._offer(self.decode_queue, (frame_index, frame, timestamp, capture_time), "overwritten")
+                continue
+
+            # Em modo tempo real, não deixa a decodificação se adiantar ao relógio do vídeo
+            timestamp = frame_timestamp(self.cap, frame_index, frame_time) - self.media_origin / 1000
+            if self.realtime:
+                delay = start + timestamp - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            if not self._put(self.decode_queue, (frame_index, frame, timestamp, capture_time)):
+                break
+
+        self.decoder_done.set()
+        self._put(self.decode_queue, None)
+
+    def _detect_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                item = self.decode_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+
+            frame_index, frame, timestamp, capture_time = item
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if self._over_budget(capture_time):
+                # Só a conversão para cinza, para a próxima diferença ainda ser entre frames vizinhos
+                self.prev_gray = gray
+                self.stats.count("skipped")
+                self._offer(self.display_queue, (frame_index, frame, None), "dropped")
+                continue
+
+            started = time.perf_counter()
+            if self.tracker is None:
+                detection = detect_largest_contour(self.prev_gray, gray, self.kernel)
+                state = None
+            else:
+                # dt vem dos tempos dos frames, então frames pulados ou irregulares são respeitados
+                dt = timestamp - self.last_timestamp
+                state = self.tracker.step(detect_contours(self.prev_gray, gray, self.kernel), dt)
+                detection = self.tracker.last_detection
+            self.prev_gray = gray
+            self.last_timestamp = timestamp
+            self.detect_cost += 0.1 * (time.perf_counter() - started - self.detect_cost)
+            self.stats.tick("detect")
+            self.stats.count("detected")
+
+            self.detections.put((frame_index, timestamp, detection, state, capture_time))
+            self._offer(self.display_queue, (frame_index, frame, detection), "dropped")
+
+        self.detector_done.set()
+
+    def _over_budget(self, capture_time):
+        # Estima quando o resultado sairia (idade do frame + custo médio da detecção);
+        # o frame mais novo da fila é sempre processado, para a detecção nunca parar
+        if self.latency_budget is None or self.decode_queue.empty():
+            return False
+        return time.perf_counter() - capture_time + self.detect_cost > self.latency_budget
+
+    def _offer(self, q, item, counter):
+        # Descarta o item mais antigo quando o consumidor não dá conta de todos
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    self.stats.count(counter)
+                except queue.Empty:
+                    pass
+
+    def poll_detections(self):
+        """
+        Retorna todas as detecções pendentes, em ordem, como (frame_index, tempo em s, detecção ou None,
+        estado). O estado é o TrackState do tracker, ou None quando o pipeline não usa tracker.
+        Frames pulados pelo orçamento de latência não aparecem. Registra a latência captura→resultado.
+        """
+        results = []
+        while True:
+            try:
+                *result, capture_time = self.detections.get_nowait()
+            except queue.Empty:
+                return results
+            self.stats.add_latency(time.perf_counter() - capture_time)
+            results.append(tuple(result))
+
+    def latest_frame(self):
+        """
+        Retorna o frame mais recente para exibição (frame_index, frame, detecção), descartando
+        os anteriores, ou None se nenhum frame novo estiver disponível.
+        """
+        latest = None
+        while True:
+            try:
+                item = self.display_queue.get_nowait()
+            except queue.Empty:
+                break
+            if latest is not None:
+                self.stats.count("dropped")
+            latest = item
+        if latest is not None:
+            self.stats.tick("render")
+            self.stats.count("rendered")
+        return latest
+
+    def queue_depths(self):
+        return {
+            "decode": self.decode_queue.qsize(),
+            "display": self.display_queue.qsize(),
+            "detections": self.detections.qsize(),
+        }
+
+    def stats_text(self):
+        depths = self.queue_depths()
+        # Fontes ao vivo não informam o FPS; usa o ritmo medido da captura
+        source_fps = self.stats.fps("decode") if self.live else self.fps
+        text = (f"FPS fonte: {source_fps:.1f}{' (ao vivo)' if self.live else ''} | "
+                f"exibição: {self.stats.fps('render'):.1f} | detecção: {self.stats.fps('detect'):.1f}\n"
+                f"Filas: decodificação {depths['decode']}, exibição {depths['display']} | "
+                f"descartados: {self.stats.counts['dropped']}")
+        latency = self.stats.latency()
+        if latency is not None:
+            text += (f"\nLatência captura→resultado: p50 {latency[0]:.0f} ms | p95 {latency[1]:.0f} ms | "
+                     f"máx {latency[2]:.0f} ms\n"
+                     f"Sobrescritos no buffer: {self.stats.counts['overwritten']} | "
+                     f"detecções puladas: {self.stats.counts['skipped']}")
+        return text
+
+
+def add_stream_arguments(parser):
+    """
+    Opções de fonte ao vivo comuns aos dashboards.
+    """
+    parser.add_argument("--ao-vivo", action="store_true",
+                        help="Reproduz o arquivo no ritmo real, como se fosse uma câmera ao vivo")
+    parser.add_argument("--orcamento", type=float, help="Orçamento de latência em ms; frames atrasados pulam a detecção")
+
+
+def stream_options(args):
+    """
+    Converte as opções de add_stream_arguments nos argumentos de open_source e TrackingPipeline.
+    """
+    return {"replay": args.ao_vivo, "latency_budget": None if args.orcamento is None else args.orcamento / 1000}
+
+
+def run_stream(cap, latency_budget=None, tracker=None, live=True, queue_size=8):
+    """
+    Roda o pipeline sem interface até a fonte acabar (ou Ctrl+C) e retorna (pipeline, resultados),
+    com os resultados como em poll_detections. Serve para medir a latência com uma câmera,
+    um fluxo RTSP ou um arquivo reproduzido no ritmo real (ReplayCapture).
+    """
+    ret, frame = cap.read()
+    if not ret:
+        raise ValueError("Não foi possível ler o primeiro frame da fonte.")
+    pipeline = TrackingPipeline(cap, frame, queue_size=queue_size, tracker=tracker, live=live,
+                                latency_budget=latency_budget)
+    results = []
+    pipeline.start()
+    try:
+        while not pipeline.finished:
+            results.extend(pipeline.poll_detections())
+            pipeline.latest_frame()
+            time.sleep(0.005)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+    results.extend(pipeline.poll_detections())
+    return pipeline, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestão ao vivo (câmera, RTSP ou vídeo no ritmo real) com medição de latência.")
+    parser.add_argument("fonte", help="Índice da câmera, URL do fluxo (rtsp://...) ou arquivo de vídeo")
+    parser.add_argument("--velocidade", type=float, default=1.0,
+                        help="Reproduz o arquivo como câmera nesta velocidade (maior que 1 sobrecarrega o detector)")
+    parser.add_argument("--orcamento", type=float, help="Orçamento de latência em ms; frames atrasados pulam a detecção")
+    parser.add_argument("--buffer", type=int, default=8, help="Frames no buffer circular da captura")
+    parser.add_argument("--sem-tracker", action="store_true", help="Usa só o maior contorno, sem o filtro balístico")
+    args = parser.parse_args()
+
+    if args.fonte.isdigit() or "://" in args.fonte:
+        cap, _ = open_source(args.fonte)
+    else:
+        cap = ReplayCapture(args.fonte, args.velocidade)
+    budget = None if args.orcamento is None else args.orcamento / 1000
+    tracker = None if args.sem_tracker else BallisticTracker()
+    try:
+        pipeline, results = run_stream(cap, budget, tracker, queue_size=args.buffer)
+    finally:
+        cap.release()
+
+    detections = sum(detection is not None for _, _, detection, _ in results)
+    print(f"Capturados: {pipeline.stats.counts['decoded']} | processados: {len(results)} | "
+          f"com detecção: {detections}")
+    print(pipeline.stats_text())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+import argparse
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from ajuste import fit_parabola
+from perfil import PROFILER
+from rastreamento import KERNEL_SIZE, MIN_AREA, THRESHOLD, detect_contours, frame_timestamp, make_kernel
+from trajetoria import TrajectoryWriter, open_trajectory, video_hash
+
+# Estado suavizado do rastreador, em pixels (y cresce para baixo, como na imagem)
+TrackState = namedtuple("TrackState", ["x", "y", "vx", "vy", "ax", "ay", "detected"])
+
+# Formato da saída de track_video_ballistic, em metros (y_m cresce para cima)
+STATE_DTYPE = np.dtype([
+    ("frame", np.int32),
+    ("t", np.float64),
+    ("detected", np.bool_),   # False quando o frame foi atravessado só com a predição
+    ("x_m", np.float64),
+    ("y_m", np.float64),
+    ("vx", np.float64),
+    ("vy", np.float64),
+    ("ax", np.float64),
+    ("ay", np.float64),
+])
+
+# Saída de track_video_multi: STATE_DTYPE com o identificador da trilha
+MULTI_STATE_DTYPE = np.dtype([("track_id", np.int32)] + STATE_DTYPE.descr)
+
+# Resultado de MultiTargetTracker.step para cada trilha viva no frame
+TrackUpdate = namedtuple("TrackUpdate", ["track_id", "state", "detection", "confirmed"])
+
+
+class BallisticTracker:
+    """
+    Filtro de Kalman com modelo de aceleração constante (balístico) para um único objeto.
+    A cada frame, associa a detecção mais próxima da predição (distância de Mahalanobis),
+    descarta as que ficam fora do gate e atravessa até max_coast frames sem detecção.
+    O vetor de estado é [x, vx, ax, y, vy, ay] em pixels.
+    """
+    def __init__(self, measurement_std=2.0, jerk_std=500.0, gate=16.0, max_coast=5,
+                 initial_velocity_std=1000.0, initial_acceleration_std=5000.0):
+        self.measurement_std = measurement_std
+        self.jerk_std = jerk_std
+        self.gate = gate
+        self.max_coast = max_coast
+        self.initial_velocity_std = initial_velocity_std
+        self.initial_acceleration_std = initial_acceleration_std
+
+        self.H = np.zeros((2, 6))
+        self.H[0, 0] = 1
+        self.H[1, 3] = 1
+        self.R = np.eye(2) * measurement_std**2
+        self.reset()
+
+    def reset(self):
+        self.state = None
+        self.P = None
+        self.coasted = 0
+        self.updates = 0
+        self.last_detection = None
+
+    @property
+    def active(self):
+        return self.state is not None
+
+    def _transition(self, dt):
+        F_axis = np.array([[1, dt, dt**2 / 2],
+                           [0, 1, dt],
+                           [0, 0, 1]])
+        G = np.array([dt**3 / 6, dt**2 / 2, dt])
+        Q_axis = np.outer(G, G) * self.jerk_std**2
+        F = np.zeros((6, 6))
+        Q = np.zeros((6, 6))
+        F[:3, :3] = F[3:, 3:] = F_axis
+        Q[:3, :3] = Q[3:, 3:] = Q_axis
+        return F, Q
+
+    def start(self, center):
+        """
+        Inicia a trilha numa posição (x, y) em pixels, com velocidade e aceleração desconhecidas.
+        """
+        self.state = np.array([center[0], 0, 0, center[1], 0, 0], dtype=float)
+        variances = [self.measurement_std**2, self.initial_velocity_std**2, self.initial_acceleration_std**2]
+        self.P = np.diag(variances * 2)
+        self.coasted = 0
+        self.updates = 1
+
+    def predict(self, dt):
+        F, Q = self._transition(dt)
+        self.state = F @ self.state
+        self.P = F @ self.P @ F.T + Q
+
+    def distances(self, centers):
+        """
+        Distância de Mahalanobis (ao quadrado) de cada posição (n, 2) à posição prevista.
+        """
+        S = self.H @ self.P @ self.H.T + self.R
+        residuals = np.asarray(centers, dtype=float) - self.H @ self.state
+        return np.einsum("ni,ij,nj->n", residuals, np.linalg.inv(S), residuals)
+
+    def update(self, center):
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.state = self.state + K @ (np.asarray(center, dtype=float) - self.H @ self.state)
+        self.P = (np.eye(6) - K @ self.H) @ self.P
+        self.coasted = 0
+        self.updates += 1
+
+    def miss(self):
+        """
+        Registra um frame sem detecção associada; encerra a trilha depois de max_coast frames.
+        """
+        self.coasted += 1
+        if self.coasted > self.max_coast:
+            self.reset()
+            return None
+        return self.current_state(detected=False)
+
+    def step(self, candidates, dt):
+        """
+        Avança o filtro em dt segundos com a lista de candidatos ((x, y, w, h), área, centroide) do frame.
+        Retorna o TrackState suavizado, ou None se não houver trilha ativa.
+        """
+        self.last_detection = None
+        centers = [center for _, _, center in candidates]
+
+        if not self.active:
+            if not candidates:
+                return None
+            # Inicia a trilha no maior contorno do frame
+            self.last_detection = candidates[0]
+            self.start(centers[0])
+            return self.current_state(detected=True)
+
+        self.predict(dt)
+        best = None
+        if centers:
+            distances = self.distances(centers)
+            index = int(np.argmin(distances))
+            if distances[index] < self.gate:
+                best = index
+
+        if best is None:
+            return self.miss()
+
+        self.update(centers[best])
+        self.last_detection = candidates[best]
+        return self.current_state(detected=True)
+
+    def current_state(self, detected):
+        x, vx, ax, y, vy, ay = self.state
+        return TrackState(x, y, vx, vy, ax, ay, detected)
+
+    def converged(self, velocity_tol, acceleration_tol, min_updates=5):
+        """
+        Indica se o desvio-padrão da velocidade e da aceleração já caiu abaixo das tolerâncias
+        (em pixels/s e pixels/s²), permitindo encerrar o processamento mais cedo.
+        """
+        if not self.active or self.updates < min_updates:
+            return False
+        std = np.sqrt(np.diag(self.P))
+        return max(std[1], std[4]) < velocity_tol and max(std[2], std[5]) < acceleration_tol
+
+
+class MultiTargetTracker:
+    """
+    Rastreia vários objetos ao mesmo tempo, com um BallisticTracker por trilha.
+    A cada frame, todas as trilhas são preditas e associadas às detecções pela distância de
+    Mahalanobis, com o algoritmo húngaro (ou guloso, com assignment="greedy"), respeitando o gate.
+    Ciclo de vida: uma detecção sem trilha nasce como trilha tentativa, confirmada depois de
+    min_hits associações; sem detecção, qualquer trilha atravessa até max_coast frames só com
+    a predição e então morre. Tentativas que morrem antes de confirmar não aparecem na saída.
+    A diferença entre frames deixa um "fantasma" na posição anterior do objeto, a um deslocamento
+    de distância. Por isso cada trilha associada reserva, em pixels, o círculo de raio
+    |v|·dt + lado do retângulo em torno da sua posição: as detecções ali dentro não alimentam
+    trilhas mais novas nem geram trilhas novas (ver claim_radius). Trilhas que já existiam também
+    bloqueiam nascimentos dentro de birth_gate (Mahalanobis com a covariância predita), o que cobre
+    velocidades ainda mal estimadas.
+    """
+    def __init__(self, min_hits=3, assignment="hungarian", birth_gate=None, **tracker_options):
+        if assignment not in ("hungarian", "greedy"):
+            raise ValueError(f"Método de associação desconhecido: {assignment}")
+        self.min_hits = min_hits
+        self.assignment = assignment
+        self.tracker_options = tracker_options
+        self.gate = BallisticTracker(**tracker_options).gate
+        self.birth_gate = 4 * self.gate if birth_gate is None else birth_gate
+        self.reset()
+
+    def reset(self):
+        self.tracks = {}      # id -> BallisticTracker
+        self.confirmed = set()
+        self.next_id = 1
+        self.born = []        # Trilhas confirmadas no último frame
+        self.died = []        # Trilhas encerradas no último frame
+
+    def _associate(self, cost):
+        """
+        Retorna os pares (trilha, detecção) dentro do gate que minimizam a distância total.
+        """
+        if self.assignment == "hungarian":
+            rows, columns = linear_sum_assignment(np.where(cost < self.gate, cost, 1e6))
+            return [(row, column) for row, column in zip(rows, columns) if cost[row, column] < self.gate]
+
+        pairs = []
+        used_rows, used_columns = set(), set()
+        for flat in np.argsort(cost, axis=None):
+            row, column = np.unravel_index(flat, cost.shape)
+            if cost[row, column] >= self.gate:
+                break
+            if row not in used_rows and column not in used_columns:
+                pairs.append((row, column))
+                used_rows.add(row)
+                used_columns.add(column)
+        return pairs
+
+    @staticmethod
+    def claim_radius(tracker, detection, dt):
+        """
+        Raio em pixels reservado por uma trilha associada: o deslocamento de um frame (onde fica o
+        fantasma da diferença entre frames) mais o lado maior do retângulo da detecção.
+        """
+        (_, _, w, h), _, _ = detection
+        return np.hypot(tracker.state[1], tracker.state[4]) * dt + max(w, h)
+
+    def step(self, candidates, dt):
+        """
+        Avança todas as trilhas em dt segundos com os candidatos ((x, y, w, h), área, centroide) do frame.
+        Retorna uma lista de TrackUpdate, uma por trilha viva (tentativa ou confirmada).
+        """
+        self.born = []
+        self.died = []
+        centers = np.array([center for _, _, center in candidates], dtype=float).reshape(-1, 2)
+        track_ids = list(self.tracks)
+        for track_id in track_ids:
+            self.tracks[track_id].predict(dt)
+
+        updates = []
+        matched_tracks = set()
+        # Detecções associadas ou dentro da região reservada por uma trilha associada
+        claimed = np.zeros(len(centers), dtype=bool)
+
+        def claim(tracker, column):
+            distances = np.hypot(*(centers - tracker.state[[0, 3]]).T)
+            claimed[:] |= distances <= self.claim_radius(tracker, candidates[column], dt)
+            claimed[column] = True
+
+        cost = np.empty((0, len(centers)))
+        if track_ids and len(centers):
+            cost = np.stack([self.tracks[track_id].distances(centers) for track_id in track_ids])
+            # Em cascata: as confirmadas escolhem primeiro; as tentativas, de covariância larga,
+            # ficam com o que sobrar, para não roubarem as detecções de uma trilha estabelecida
+            confirmed = np.array([track_id in self.confirmed for track_id in track_ids])
+            for group in (np.flatnonzero(confirmed), np.flatnonzero(~confirmed)):
+                free = np.flatnonzero(~claimed)
+                if not len(group) or not len(free):
+                    continue
+                # Das mais antigas para as mais novas: uma detecção reservada por uma trilha já
+                # associada (o fantasma dela) não alimenta uma trilha mais nova, que fica sem detecção
+                for row, column in sorted(self._associate(cost[np.ix_(group, free)])):
+                    column = free[column]
+                    if claimed[column]:
+                        continue
+                    track_id = track_ids[group[row]]
+                    tracker = self.tracks[track_id]
+                    tracker.update(centers[column])
+                    tracker.last_detection = candidates[column]
+                    matched_tracks.add(track_id)
+                    claim(tracker, column)
+                    if track_id not in self.confirmed and tracker.updates >= self.min_hits:
+                        self.confirmed.add(track_id)
+                        self.born.append(track_id)
+                    updates.append(TrackUpdate(track_id, tracker.current_state(detected=True), candidates[column],
+                                               track_id in self.confirmed))
+
+        for track_id in track_ids:
+            if track_id in matched_tracks:
+                continue
+            tracker = self.tracks[track_id]
+            tracker.last_detection = None
+            state = tracker.miss()
+            if state is None:
+                del self.tracks[track_id]
+                self.confirmed.discard(track_id)
+                self.died.append(track_id)
+            else:
+                updates.append(TrackUpdate(track_id, state, None, track_id in self.confirmed))
+
+        # Detecções fora das regiões reservadas iniciam trilhas tentativas. Os candidatos vêm do
+        # maior para o menor, e cada trilha nova também reserva a região ao seu redor. Só as
+        # trilhas que receberam detecção reservam: uma trilha atravessando sem detecção não deve
+        # impedir o reinício
+        matched_rows = [row for row, track_id in enumerate(track_ids) if track_id in matched_tracks]
+        claimed |= (cost[matched_rows] < self.birth_gate).any(axis=0)
+        for column, center in enumerate(centers):
+            if claimed[column]:
+                continue
+            tracker = BallisticTracker(**self.tracker_options)
+            tracker.start(center)
+            claim(tracker, column)
+            tracker.last_detection = candidates[column]
+            track_id = self.next_id
+            self.next_id += 1
+            self.tracks[track_id] = tracker
+            if self.min_hits <= 1:
+                self.confirmed.add(track_id)
+                self.born.append(track_id)
+            updates.append(TrackUpdate(track_id, tracker.current_state(detected=True), candidates[column],
+                                       track_id in self.confirmed))
+        return updates
+
+
+def track_video_ballistic(video_path, scale_factor, stop_when_converged=False, velocity_tol=0.1, acceleration_tol=0.5,
+                          threshold=THRESHOLD, kernel_size=KERNEL_SIZE, min_area=MIN_AREA, output_path=None, **tracker_options):
+    """
+    Rastreia o vídeo sem interface usando o BallisticTracker em vez do maior contorno de cada frame.
+    Retorna um array STATE_DTYPE com os estados suavizados em metros. Com stop_when_converged=True,
+    para de decodificar assim que a velocidade (m/s) e a aceleração (m/s²) atingem as tolerâncias.
+    Com output_path, os estados são gravados em .traj durante o processamento e o retorno é o np.memmap.
+    """
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    if not ret:
+        cap.release()
+        raise IOError(f"Erro ao carregar o vídeo: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_time = 1 / fps if fps > 0 else 0
+    frame_height = frame.shape[0]
+    kernel = make_kernel(kernel_size)
+    tracker = BallisticTracker(**tracker_options)
+
+    rows = []
+    writer = None
+    if output_path is not None:
+        writer = TrajectoryWriter(output_path, STATE_DTYPE, fps=fps, scale=scale_factor, source_hash=video_hash(video_path))
+    add_row = rows.append if writer is None else writer.append
+
+    prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = np.empty_like(prev_gray)
+    frame_index = 0
+    prev_t = frame_timestamp(cap, frame_index, frame_time)
+
+    while True:
+        with PROFILER.stage("decode"):
+            ret, frame = cap.read(frame)
+        if not ret:
+            break
+        frame_index += 1
+
+        # dt pelos tempos do vídeo, não por 1/fps: respeita taxas variáveis e frames faltando
+        t = frame_timestamp(cap, frame_index, frame_time)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        state = tracker.step(detect_contours(prev_gray, gray, kernel, threshold, min_area), t - prev_t)
+        prev_gray, gray = gray, prev_gray
+        prev_t = t
+
+        if state is None:
+            continue
+        add_row((frame_index, t, state.detected,
+                 state.x * scale_factor, (frame_height - state.y) * scale_factor,
+                 state.vx * scale_factor, -state.vy * scale_factor,
+                 state.ax * scale_factor, -state.ay * scale_factor))
+
+        if stop_when_converged and tracker.converged(velocity_tol / scale_factor, acceleration_tol / scale_factor):
+            break
+
+    cap.release()
+    if writer is not None:
+        writer.close()
+        return open_trajectory(output_path)[1]
+    return np.array(rows, dtype=STATE_DTYPE)
+
+
+def track_video_multi(video_path, scale_factor, threshold=THRESHOLD, kernel_size=KERNEL_SIZE, min_area=MIN_AREA,
+                      output_path=None, min_hits=3, assignment="hungarian", **tracker_options):
+    """
+    Rastreia todos os objetos do vídeo numa única decodificação com o MultiTargetTracker.
+    Retorna um array MULTI_STATE_DTYPE (estados em metros, ordenados por frame e trilha) só com as
+    trilhas confirmadas; as linhas do período tentativo de cada trilha entram quando ela é confirmada.
+    Para manter a ordem, as linhas confirmadas esperam enquanto alguma trilha tentativa tiver linhas
+    de frames anteriores (no máximo min_hits + max_coast frames).
+    Com output_path, grava em .traj durante o processamento e retorna o np.memmap.
+    """
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    if not ret:
+        cap.release()
+        raise IOError(f"Erro ao carregar o vídeo: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_time = 1 / fps if fps > 0 else 0
+    frame_height = frame.shape[0]
+    kernel = make_kernel(kernel_size)
+    tracker = MultiTargetTracker(min_hits=min_hits, assignment=assignment, **tracker_options)
+
+    rows = []
+    writer = None
+    if output_path is not None:
+        writer = TrajectoryWriter(output_path, MULTI_STATE_DTYPE, fps=fps, scale=scale_factor,
+                                  source_hash=video_hash(video_path))
+    add_row = rows.append if writer is None else writer.append
+    pending = {}  # Linhas das trilhas ainda tentativas
+    held = []     # Linhas confirmadas à espera das tentativas mais antigas
+
+    prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = np.empty_like(prev_gray)
+    frame_index = 0
+    prev_t = frame_timestamp(cap, frame_index, frame_time)
+
+    while True:
+        with PROFILER.stage("decode"):
+            ret, frame = cap.read(frame)
+        if not ret:
+            break
+        frame_index += 1
+
+        t = frame_timestamp(cap, frame_index, frame_time)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        updates = tracker.step(detect_contours(prev_gray, gray, kernel, threshold, min_area), t - prev_t)
+        prev_gray, gray = gray, prev_gray
+        prev_t = t
+
+        for track_id in tracker.died:
+            pending.pop(track_id, None)
+        for track_id, state, _, confirmed in updates:
+            row = (track_id, frame_index, t, state.detected,
+                   state.x * scale_factor, (frame_height - state.y) * scale_factor,
+                   state.vx * scale_factor, -state.vy * scale_factor,
+                   state.ax * scale_factor, -state.ay * scale_factor)
+            if not confirmed:
+                pending.setdefault(track_id, []).append(row)
+                continue
+            held.extend(pending.pop(track_id, ()))
+            held.append(row)
+
+        # Grava, por (frame, trilha), as linhas anteriores à linha tentativa mais antiga
+        oldest_pending = min((tentative[0][1] for tentative in pending.values()), default=frame_index + 1)
+        held.sort(key=lambda row: (row[1], row[0]))
+        ready = sum(1 for row in held if row[1] < oldest_pending)
+        for row in held[:ready]:
+            add_row(row)
+        del held[:ready]
+
+    for row in sorted(held, key=lambda row: (row[1], row[0])):
+        add_row(row)
+    cap.release()
+    if writer is not None:
+        writer.close()
+        return open_trajectory(output_path)[1]
+    return np.array(rows, dtype=MULTI_STATE_DTYPE)
+
+
+def fit_tracks(states, min_points=4):
+    """
+    Ajusta a parábola de fit_parabola a cada trilha de um array MULTI_STATE_DTYPE, usando só
+    os frames com detecção. Retorna {track_id: ajuste} para as trilhas com ao menos min_points
+    pontos (com 3, o ajuste passa exatamente pelos pontos e não há covariância).
+    """
+    fits = {}
+    for track_id in np.unique(states["track_id"]):
+        track = states[(states["track_id"] == track_id) & states["detected"]]
+        if len(track) >= min_points:
+            fits[int(track_id)] = fit_parabola(track["x_m"], track["y_m"])
+    return fits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rastreamento balístico (Kalman) sem interface gráfica.")
+    parser.add_argument("video", help="Caminho do vídeo")
+    parser.add_argument("--escala", type=float, required=True, help="Fator de escala em metros por pixel")
+    parser.add_argument("--parar-ao-convergir", action="store_true",
+                        help="Encerra assim que velocidade e aceleração convergirem")
+    parser.add_argument("--saida", help="Arquivo .traj para salvar os estados")
+    parser.add_argument("--multi", action="store_true",
+                        help="Rastreia todos os objetos em movimento, cada um com sua trilha")
+    args = parser.parse_args()
+
+    if args.multi:
+        states = track_video_multi(args.video, args.escala, output_path=args.saida)
+        fits = fit_tracks(states)
+        print(f"Trilhas confirmadas: {len(np.unique(states['track_id']))}")
+        for track_id in np.unique(states["track_id"]):
+            track = states[states["track_id"] == track_id]
+            line = f"Trilha {track_id}: frames {track['frame'][0]}-{track['frame'][-1]}, {track['detected'].sum()} detecções"
+            if track_id in fits:
+                line += f" | g (ajuste): {fits[track_id]['g']:.4f} | v0: {fits[track_id]['v0']:.4f}"
+            print(line)
+        return
+
+    states = track_video_ballistic(args.video, args.escala, stop_when_converged=args.parar_ao_convergir,
+                                   output_path=args.saida)
+    if len(states) == 0:
+        print("Nenhuma trilha encontrada.")
+        return
+
+    last = states[-1]
+    print(f"Frames com trilha: {len(states)} (último frame: {last['frame']})")
+    print(f"Velocidade: ({last['vx']:.4f}, {last['vy']:.4f}) m/s")
+    print(f"Aceleração (g): {-last['ay']:.4f} m/s²")
+
+
+if __name__ == "__main__":
+    main()
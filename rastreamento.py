@@ -0,0 +1,377 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from perfil import PROFILER
+from trajetoria import TrajectoryWriter, open_trajectory, save_trajectory, video_hash
+
+# Parâmetros padrão do detector (os mesmos usados nos dashboards)
+THRESHOLD = 10
+KERNEL_SIZE = 3
+MIN_AREA = 20
+
+# Formato da trajetória retornada pelo modo sem interface
+TRAJECTORY_DTYPE = np.dtype([
+    ("frame", np.int32),     # Índice do frame no vídeo
+    ("t", np.float64),       # Instante em segundos
+    ("cx", np.float32),      # Centro em pixels
+    ("cy", np.float32),
+    ("x", np.int32),         # Retângulo envolvente em pixels
+    ("y", np.int32),
+    ("w", np.int32),
+    ("h", np.int32),
+    ("area", np.float32),    # Área do contorno em pixels²
+    ("x_m", np.float64),     # Posição horizontal em metros
+    ("y_m", np.float64),     # Altura em metros (medida a partir da base do frame)
+])
+
+# Versão do cálculo das detecções (2: centroide pelos momentos e tempos do vídeo); entra na chave do cache
+DETECTION_VERSION = 2
+
+
+def make_kernel(kernel_size=KERNEL_SIZE):
+    """
+    Cria o elemento estruturante elíptico usado nas operações morfológicas.
+    """
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+
+
+def contour_centroid(contour, box):
+    """
+    Centroide sub-pixel do contorno pelos momentos (m10/m00, m01/m00), ou o centro do
+    retângulo envolvente se o contorno for degenerado (área nula).
+    """
+    moments = cv2.moments(contour)
+    if moments["m00"] == 0:
+        x, y, w, h = box
+        return x + w / 2, y + h / 2
+    return moments["m10"] / moments["m00"], moments["m01"] / moments["m00"]
+
+
+def frame_timestamp(cap, frame_index, frame_time):
+    """
+    Instante em segundos do frame recém-lido, pelo CAP_PROP_POS_MSEC do vídeo (que respeita
+    taxas variáveis); se o backend não informar, frame_index * frame_time.
+    POS_MSEC == 0 é tratado como "não informado": só o frame 0 está de fato em 0 ms, e para ele
+    o cálculo de reserva também dá 0 (frame_index conta a partir do primeiro frame lido).
+    """
+    msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if msec > 0:
+        return msec / 1000
+    return frame_index * frame_time
+
+
+def find_motion_contours(prev_gray, gray, kernel, threshold=THRESHOLD):
+    """
+    Aplica absdiff, threshold, fechamento/abertura e findContours entre dois frames em tons de cinza.
+    """
+    with PROFILER.stage("absdiff/threshold"):
+        frame_diff = cv2.absdiff(prev_gray, gray)
+        _, thresh = cv2.threshold(frame_diff, threshold, 255, cv2.THRESH_BINARY)
+
+    # Operações morfológicas para limpar ruídos
+    with PROFILER.stage("morph_close"):
+        thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+    with PROFILER.stage("morph_open"):
+        thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+
+    with PROFILER.stage("findContours"):
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return contours
+
+
+def detect_contours(prev_gray, gray, kernel, threshold=THRESHOLD, min_area=MIN_AREA):
+    """
+    Retorna a lista de ((x, y, w, h), área, (cx, cy)) de todos os contornos com área acima de
+    min_area, do maior para o menor; (cx, cy) é o centroide sub-pixel do contorno.
+    """
+    contours = find_motion_contours(prev_gray, gray, kernel, threshold)
+
+    candidates = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area > min_area:
+            box = cv2.boundingRect(contour)
+            candidates.append((box, area, contour_centroid(contour, box)))
+
+    candidates.sort(key=lambda candidate: candidate[1], reverse=True)
+    return candidates
+
+
+def detect_largest_contour(prev_gray, gray, kernel, threshold=THRESHOLD, min_area=MIN_AREA):
+    """
+    Retorna ((x, y, w, h), área, (cx, cy)) do maior contorno com área acima de min_area, ou None.
+    """
+    contours = find_motion_contours(prev_gray, gray, kernel, threshold)
+
+    largest_contour = None
+    max_area = 0
+
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area > min_area and area > max_area:
+            max_area = area
+            largest_contour = contour
+
+    if largest_contour is None:
+        return None
+    box = cv2.boundingRect(largest_contour)
+    return box, max_area, contour_centroid(largest_contour, box)
+
+
+class AdaptiveRoiDetector:
+    """
+    Detector com região de interesse adaptativa. Depois de duas detecções seguidas (com uma só
+    não há velocidade para prever), só processa uma janela em torno da posição prevista
+    (aceleração constante a partir das últimas posições); se algum contorno encosta na borda da
+    janela, ela cresce e a detecção é refeita. Quando o objeto se perde, volta a procurar no
+    frame inteiro reduzido por search_scale.
+    Tem a mesma interface de detect_largest_contour: detect(prev_gray, gray) -> ((x, y, w, h), área, (cx, cy)) ou None.
+    """
+    def __init__(self, kernel, threshold=THRESHOLD, min_area=MIN_AREA, search_scale=0.5, window_margin=3, min_window=32):
+        self.kernel = kernel
+        self.threshold = threshold
+        self.min_area = min_area
+        self.search_scale = search_scale
+        self.window_margin = window_margin
+        self.min_window = min_window
+        self.positions = deque(maxlen=3)
+        self.last_size = 0
+
+    def predict(self):
+        """
+        Extrapola a próxima posição: quadrática com 3 pontos, linear com 2, parada com 1.
+        """
+        if len(self.positions) == 3:
+            (x1, y1), (x2, y2), (x3, y3) = self.positions
+            return 3 * x3 - 3 * x2 + x1, 3 * y3 - 3 * y2 + y1
+        if len(self.positions) == 2:
+            (x1, y1), (x2, y2) = self.positions
+            return 2 * x2 - x1, 2 * y2 - y1
+        return self.positions[-1]
+
+    def detect(self, prev_gray, gray):
+        if len(self.positions) >= 2:
+            detection = self._detect_in_window(prev_gray, gray)
+            if detection is not None:
+                return self._update(detection)
+            # Objeto perdido: descarta o histórico e volta à busca global
+            self.positions.clear()
+
+        detection = self._detect_downscaled(prev_gray, gray)
+        if detection is not None:
+            return self._update(detection)
+        return None
+
+    def _update(self, detection):
+        (_, _, w, h), _, center = detection
+        self.positions.append(center)
+        self.last_size = max(w, h)
+        return detection
+
+    def _detect_in_window(self, prev_gray, gray):
+        pred_x, pred_y = self.predict()
+        last_x, last_y = self.positions[-1]
+        # A previsão erra quando o histórico inclui o rastro da posição anterior (posição repetida
+        # ou recuada): a janela cobre também o maior passo recente em qualquer direção
+        history = np.array(self.positions)
+        step = np.abs(np.diff(history, axis=0)).sum(axis=1).max()
+        speed = abs(pred_x - last_x) + abs(pred_y - last_y) + step
+        half = int(max(self.min_window, self.window_margin * self.last_size) + speed)
+
+        frame_h, frame_w = gray.shape
+        while True:
+            x0, y0 = max(0, int(pred_x) - half), max(0, int(pred_y) - half)
+            x1, y1 = min(frame_w, int(pred_x) + half), min(frame_h, int(pred_y) + half)
+            if x1 <= x0 or y1 <= y0:
+                return None
+
+            candidates = detect_contours(prev_gray[y0:y1, x0:x1], gray[y0:y1, x0:x1], self.kernel,
+                                         self.threshold, self.min_area)
+            if not candidates:
+                return None
+
+            # Contorno cortado pela janela (e não pela borda do frame): a área e o centro dele estão
+            # errados e ele pode ser o objeto, maior que o rastro deixado na posição anterior;
+            # dobra a janela e refaz
+            clipped = any((x == 0 and x0 > 0) or (y == 0 and y0 > 0) or
+                          (x + w == x1 - x0 and x1 < frame_w) or (y + h == y1 - y0 and y1 < frame_h)
+                          for (x, y, w, h), _, _ in candidates)
+            if not clipped:
+                (x, y, w, h), area, (cx, cy) = candidates[0]
+                return (x + x0, y + y0, w, h), area, (cx + x0, cy + y0)
+            half *= 2
+
+    def _detect_downscaled(self, prev_gray, gray):
+        scale = self.search_scale
+        if scale >= 1:
+            return detect_largest_contour(prev_gray, gray, self.kernel, self.threshold, self.min_area)
+
+        prev_small = cv2.resize(prev_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        detection = detect_largest_contour(prev_small, small, self.kernel, self.threshold, self.min_area * scale * scale)
+        if detection is None:
+            return None
+        (x, y, w, h), area, (cx, cy) = detection
+        # Centros de pixel: o pixel i da imagem reduzida cobre [i, i + 1) / scale na original
+        return ((int(x / scale), int(y / scale), int(round(w / scale)), int(round(h / scale))), area / (scale * scale),
+                ((cx + 0.5) / scale - 0.5, (cy + 0.5) / scale - 0.5))
+
+
+def track_video_headless(video_path, scale_factor, threshold=THRESHOLD, kernel_size=KERNEL_SIZE, min_area=MIN_AREA, roi=False,
+                         output_path=None):
+    """
+    Rastreia o objeto em movimento em todo o vídeo, sem Tk e sem desenhar nada.
+    Processa os frames tão rápido quanto a decodificação permite e retorna um array
+    estruturado (TRAJECTORY_DTYPE) com uma linha por frame em que o objeto foi detectado.
+    Com roi=True usa o AdaptiveRoiDetector em vez de processar o frame inteiro.
+    Com output_path, as detecções são gravadas em .traj durante o processamento (sem acumular
+    na memória) e o retorno é o np.memmap do arquivo gravado.
+    """
+    if output_path is None:
+        return track_frame_range(video_path, scale_factor, 1, None, threshold, kernel_size, min_area, roi)
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    with TrajectoryWriter(output_path, TRAJECTORY_DTYPE, fps=fps, scale=scale_factor, source_hash=video_hash(video_path),
+                          threshold=threshold, kernel_size=kernel_size, min_area=min_area) as writer:
+        track_frame_range(video_path, scale_factor, 1, None, threshold, kernel_size, min_area, roi, writer)
+    return open_trajectory(output_path)[1]
+
+
+def track_frame_range(video_path, scale_factor, start_frame, end_frame, threshold=THRESHOLD, kernel_size=KERNEL_SIZE, min_area=MIN_AREA, roi=False,
+                      writer=None):
+    """
+    Rastreia os frames [start_frame, end_frame) do vídeo (end_frame=None vai até o fim).
+    O frame start_frame - 1 é lido como referência do absdiff, então blocos consecutivos
+    produzem exatamente as mesmas detecções que uma passada única.
+    Se um TrajectoryWriter for passado, as detecções vão direto para ele e o retorno é None.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if start_frame > 1:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame - 1)
+    ret, frame = cap.read()
+    if not ret:
+        cap.release()
+        raise IOError(f"Erro ao carregar o vídeo: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_time = 1 / fps if fps > 0 else 0
+    frame_height = frame.shape[0]
+    kernel = make_kernel(kernel_size)
+    if roi:
+        detect = AdaptiveRoiDetector(kernel, threshold, min_area).detect
+    else:
+        def detect(prev_gray, gray):
+            return detect_largest_contour(prev_gray, gray, kernel, threshold, min_area)
+
+    prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = np.empty_like(prev_gray)
+    rows = []
+    add_row = rows.append if writer is None else writer.append
+    frame_index = start_frame - 1
+
+    while end_frame is None or frame_index + 1 < end_frame:
+        with PROFILER.stage("decode"):
+            ret, frame = cap.read(frame)
+        if not ret:
+            break
+        frame_index += 1
+
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        detection = detect(prev_gray, gray)
+
+        if detection is not None:
+            (x, y, w, h), area, (center_x, center_y) = detection
+            add_row((frame_index, frame_timestamp(cap, frame_index, frame_time), center_x, center_y, x, y, w, h, area,
+                     center_x * scale_factor, (frame_height - center_y) * scale_factor))
+
+        # Reaproveita os buffers em vez de alocar um novo frame cinza a cada iteração
+        prev_gray, gray = gray, prev_gray
+
+    cap.release()
+    if writer is not None:
+        return None
+    return np.array(rows, dtype=TRAJECTORY_DTYPE)
+
+
+def split_frame_ranges(frame_count, chunks):
+    """
+    Divide os frames 1..frame_count-1 (o frame 0 só serve de referência) em blocos contíguos.
+    O último bloco fica em aberto (end=None) caso CAP_PROP_FRAME_COUNT esteja subestimado.
+    """
+    bounds = np.linspace(1, frame_count, chunks + 1).round().astype(int)
+    ranges = [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+    if ranges:
+        ranges[-1] = (ranges[-1][0], None)
+    return ranges
+
+
+def track_video_chunked(video_path, scale_factor, chunks=None, workers=None, threshold=THRESHOLD, kernel_size=KERNEL_SIZE, min_area=MIN_AREA, roi=False):
+    """
+    Divide um único vídeo em intervalos de frames processados em paralelo por um pool de processos.
+    Cada bloco reprocessa um frame de sobreposição para manter o absdiff correto na fronteira,
+    e as detecções são concatenadas na ordem dos frames.
+    """
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    workers = workers or os.cpu_count() or 1
+    ranges = split_frame_ranges(frame_count, chunks or workers)
+    if len(ranges) <= 1:
+        return track_video_headless(video_path, scale_factor, threshold, kernel_size, min_area, roi)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(track_frame_range, video_path, scale_factor, start, end, threshold, kernel_size, min_area, roi)
+                   for start, end in ranges]
+        parts = [future.result() for future in futures]
+
+    return np.concatenate(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rastreamento sem interface gráfica de um lançamento oblíquo.")
+    parser.add_argument("video", help="Caminho do vídeo")
+    parser.add_argument("--escala", type=float, required=True, help="Fator de escala em metros por pixel")
+    parser.add_argument("--saida", help="Arquivo .traj para salvar a trajetória")
+    parser.add_argument("--blocos", type=int, default=0,
+                        help="Divide o vídeo em N intervalos de frames processados em paralelo")
+    parser.add_argument("--roi", action="store_true",
+                        help="Processa só uma janela em torno da posição prevista do objeto")
+    parser.add_argument("--perfil",
+                        help="Mede o tempo de cada estágio e grava a linha do tempo neste arquivo .json ou .csv "
+                             "(só no modo sequencial)")
+    args = parser.parse_args()
+
+    if args.perfil:
+        PROFILER.enable()
+
+    start = time.perf_counter()
+    if args.blocos > 1:
+        trajectory = track_video_chunked(args.video, args.escala, chunks=args.blocos, roi=args.roi)
+        if args.saida:
+            fps = cv2.VideoCapture(args.video).get(cv2.CAP_PROP_FPS)
+            save_trajectory(args.saida, trajectory, fps=fps, scale=args.escala, source_hash=video_hash(args.video))
+    else:
+        trajectory = track_video_headless(args.video, args.escala, roi=args.roi, output_path=args.saida)
+    elapsed = time.perf_counter() - start
+
+    print(f"Detecções: {len(trajectory)} em {elapsed:.2f} s")
+    if args.saida:
+        print(f"Trajetória salva em {args.saida}")
+    if args.perfil:
+        print(PROFILER.summary_text())
+        PROFILER.dump(args.perfil)
+        print(f"Perfil salvo em {args.perfil}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import warnings
+
+import numpy as np
+
+# Ordem dos parâmetros de um lançamento nas médias, covariâncias e varreduras
+PARAMETERS = ("angulo", "v0", "g", "h0")
+METRICS = ("alcance", "altura_max", "tempo_voo", "tempo_apice")
+DEFAULT_CHUNK = 1 << 18  # Elementos avaliados por bloco; limita a memória dos intermediários
+
+
+def launch_metrics(angulo, v0, g, h0=0.0):
+    """
+    Alcance, altura máxima, tempo de voo e instante do ápice do lançamento oblíquo sem arrasto,
+    com ângulo em graus e lançamento de uma altura h0 acima do solo. Os argumentos podem ser
+    arrays de quaisquer formatos compatíveis (broadcasting); o retorno é um dicionário de arrays.
+    """
+    theta = np.radians(angulo)
+    vx = v0 * np.cos(theta)
+    vy = v0 * np.sin(theta)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Raiz positiva de h0 + vy t - g t²/2 = 0
+        tempo_voo = (vy + np.sqrt(vy**2 + 2 * g * h0)) / g
+        tempo_apice = np.maximum(vy, 0) / g
+    return {"alcance": vx * tempo_voo,
+            "altura_max": h0 + vy * tempo_apice - 0.5 * g * tempo_apice**2,
+            "tempo_voo": tempo_voo,
+            "tempo_apice": tempo_apice}
+
+
+def trajectory_height(x, angulo, v0, g, h0=0.0):
+    """
+    Altura y(x) da trajetória; x com formato (n_pontos,) e os parâmetros com formato (n,) dão (n, n_pontos).
+    """
+    theta = np.radians(np.asarray(angulo, dtype=float))[..., None]
+    v0 = np.asarray(v0, dtype=float)[..., None]
+    g = np.asarray(g, dtype=float)[..., None]
+    h0 = np.asarray(h0, dtype=float)[..., None]
+    return h0 + np.tan(theta) * x - g * x**2 / (2 * (v0 * np.cos(theta))**2)
+
+
+def iter_sweep(angulo, v0, g, h0=0.0, chunk_size=DEFAULT_CHUNK):
+    """
+    Percorre todas as combinações das grades 1-D de (ângulo, v0, g, h0) em blocos de chunk_size.
+    Gera (fatia no vetor achatado, métricas do bloco), para reduzir os resultados sem guardar tudo.
+    """
+    grids = [np.atleast_1d(np.asarray(values, dtype=float)) for values in (angulo, v0, g, h0)]
+    shape = tuple(len(grid) for grid in grids)
+    total = int(np.prod(shape))
+    for start in range(0, total, chunk_size):
+        flat = np.arange(start, min(start + chunk_size, total))
+        indices = np.unravel_index(flat, shape)
+        values = [grid[index] for grid, index in zip(grids, indices)]
+        yield slice(start, start + len(flat)), launch_metrics(*values)
+
+
+def sweep(angulo, v0, g, h0=0.0, chunk_size=DEFAULT_CHUNK, dtype=np.float64):
+    """
+    Varredura completa do produto cartesiano das grades. Retorna um dicionário de arrays com
+    formato (n_angulo, n_v0, n_g, n_h0); com dtype=np.float32 a saída ocupa metade da memória.
+    """
+    grids = [np.atleast_1d(values) for values in (angulo, v0, g, h0)]
+    shape = tuple(len(grid) for grid in grids)
+    results = {name: np.empty(int(np.prod(shape)), dtype=dtype) for name in METRICS}
+    for chunk, metrics in iter_sweep(angulo, v0, g, h0, chunk_size):
+        for name in METRICS:
+            results[name][chunk] = metrics[name]
+    return {name: values.reshape(shape) for name, values in results.items()}
+
+
+class HistogramQuantiles:
+    """
+    Quantis aproximados de um fluxo de amostras com memória fixa: cada coluna acumula um
+    histograma de `bins` classes em [low, high] (valores fora caem nas classes das bordas).
+    """
+    def __init__(self, low, high, bins=4096):
+        self.low = np.atleast_1d(np.asarray(low, dtype=float))
+        high = np.atleast_1d(np.asarray(high, dtype=float))
+        self.bins = bins
+        self.width = np.maximum(high - self.low, 1e-12) / bins
+        self.counts = np.zeros((len(self.low), bins), dtype=np.int64)
+
+    @classmethod
+    def from_sample(cls, values, bins=4096, pad=0.5):
+        """
+        Define os intervalos a partir de um bloco piloto, com folga de `pad` vezes a amplitude.
+        """
+        values = np.asarray(values, dtype=float).reshape(len(values), -1)
+        finite = np.where(np.isfinite(values), values, np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # Colunas sem nenhum valor finito
+            low, high = np.nanmin(finite, axis=0), np.nanmax(finite, axis=0)
+        low, high = np.nan_to_num(low), np.nan_to_num(high)
+        span = high - low
+        return cls(low - pad * span, high + pad * span, bins)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float).reshape(len(values), -1)
+        valid = np.isfinite(values)
+        index = np.clip(np.floor((np.where(valid, values, 0) - self.low) / self.width), 0, self.bins - 1)
+        index = index.astype(np.int64) + np.arange(values.shape[1]) * self.bins
+        self.counts += np.bincount(index[valid], minlength=self.counts.size).reshape(self.counts.shape)
+
+    def quantiles(self, probabilities):
+        """
+        Retorna um array (len(probabilities), colunas), interpolando linearmente dentro da classe.
+        """
+        cdf = np.cumsum(self.counts, axis=1)
+        total = cdf[:, -1]
+        result = np.full((len(probabilities), len(self.low)), np.nan)
+        columns = np.arange(len(self.low))
+        for row, probability in enumerate(probabilities):
+            target = probability * total
+            k = np.argmax(cdf >= target[:, None], axis=1)
+            below = np.where(k > 0, cdf[columns, k - 1], 0)
+            inside = np.maximum(self.counts[columns, k], 1)
+            result[row] = np.where(total > 0, self.low + (k + (target - below) / inside) * self.width, np.nan)
+        return result
+
+
+def _monte_carlo(draw, samples, chunk_size, probabilities, x, rng):
+    """
+    Laço comum do Monte Carlo: `draw(n, rng)` devolve (ângulo, v0, g, h0) e, opcionalmente,
+    as alturas y(x) de n lançamentos. Cada bloco é reduzido a somas e histogramas e descartado.
+    """
+    rng = np.random.default_rng(rng)
+    sums = {name: 0.0 for name in METRICS}
+    squares = {name: 0.0 for name in METRICS}
+    valid = {name: 0 for name in METRICS}
+    histograms = None
+    band = None
+
+    # As alturas y(x) ocupam n_pontos elementos por amostra; o bloco encolhe para caber no mesmo limite
+    rows = chunk_size if x is None else max(1, chunk_size // len(x))
+    for start in range(0, samples, rows):
+        n = min(rows, samples - start)
+        parameters, heights = draw(n, rng)
+        metrics = launch_metrics(*parameters)
+        values = np.stack([metrics[name] for name in METRICS], axis=1)
+
+        if histograms is None:
+            histograms = HistogramQuantiles.from_sample(values)
+        histograms.add(values)
+        for column, name in enumerate(METRICS):
+            finite = values[:, column][np.isfinite(values[:, column])]
+            sums[name] += finite.sum()
+            squares[name] += (finite**2).sum()
+            valid[name] += len(finite)
+
+        if x is not None:
+            if band is None:
+                band = HistogramQuantiles.from_sample(heights)
+            band.add(heights)
+
+    quantiles = histograms.quantiles(probabilities)
+    result = {"probabilidades": tuple(probabilities)}
+    for column, name in enumerate(METRICS):
+        count = max(valid[name], 1)
+        mean = sums[name] / count
+        result[name] = {"media": mean,
+                        "desvio": np.sqrt(max(squares[name] / count - mean**2, 0.0)),
+                        "faixa": quantiles[:, column],
+                        "validas": valid[name]}
+    if x is not None:
+        result["x"] = x
+        result["faixa_y"] = band.quantiles(probabilities)
+    return result
+
+
+def monte_carlo(mean, cov, samples=1_000_000, chunk_size=DEFAULT_CHUNK, probabilities=(0.025, 0.5, 0.975),
+                x=None, rng=None):
+    """
+    Propaga a incerteza de (ângulo, v0, g, h0), distribuídos como normal multivariada com média
+    `mean` e covariância `cov`, para alcance, altura máxima, tempo de voo e instante do ápice.
+    Com `x`, também calcula a faixa de confiança da altura y(x) em cada ponto.
+    A memória usada não depende de `samples`: os blocos são reduzidos a somas e histogramas.
+    Para cada métrica retorna média, desvio, quantis ("faixa") e o número de amostras válidas.
+    `cov` pode ser singular, por exemplo com variância zero para g ou h0 fixos.
+    """
+    mean = np.asarray(mean, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+    x = None if x is None else np.asarray(x, dtype=float)
+
+    def draw(n, rng):
+        parameters = rng.multivariate_normal(mean, cov, size=n, method="eigh").T
+        heights = None if x is None else trajectory_height(x, *parameters)
+        return parameters, heights
+
+    return _monte_carlo(draw, samples, chunk_size, probabilities, x, rng)
+
+
+def parabola_to_launch(a, b, c, g=9.81):
+    """
+    Converte y(x) = ax² + bx + c (lançamento em x = 0, y para cima) em (ângulo, v0, g, h0),
+    dado g. Coeficientes com a >= 0 não correspondem a um lançamento e dão v0 = nan.
+    """
+    angulo = np.degrees(np.arctan(b))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # a = -g / (2 v0² cos²θ) e 1/cos²θ = 1 + b²
+        v0 = np.sqrt(np.where(a < 0, -g * (1 + b**2) / (2 * a), np.nan))
+    return angulo, v0, np.broadcast_to(g, np.shape(a)), c
+
+
+def monte_carlo_fit(fit, g=9.81, samples=1_000_000, chunk_size=DEFAULT_CHUNK, probabilities=(0.025, 0.5, 0.975),
+                    x=None, rng=None):
+    """
+    Monte Carlo a partir de um ajuste de fit_parabola/fit_parabola_robust: sorteia (a, b, c)
+    com a covariância do ajuste, converte cada amostra em lançamento (parabola_to_launch) e
+    reduz como em monte_carlo. A faixa de y(x) vem direto dos coeficientes e não depende de g.
+    """
+    mean = np.array([fit["a"], fit["b"], fit["c"]], dtype=float)
+    cov = np.asarray(fit["covariancia"], dtype=float)
+    x = None if x is None else np.asarray(x, dtype=float)
+
+    def draw(n, rng):
+        a, b, c = rng.multivariate_normal(mean, cov, size=n, method="svd").T
+        heights = None if x is None else a[:, None] * x**2 + b[:, None] * x + c[:, None]
+        return parabola_to_launch(a, b, c, g), heights
+
+    return _monte_carlo(draw, samples, chunk_size, probabilities, x, rng)
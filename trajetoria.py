@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+# Formato do arquivo .traj:
+#   MAGIC (6 bytes) | tamanho do cabeçalho (uint32) | cabeçalho JSON (preenchido até múltiplo de 64) | registros
+# Os registros são o array estruturado cru, então o arquivo abre direto com np.memmap.
+MAGIC = b"TRAJ01"
+HEADER_ALIGN = 64
+COUNT_WIDTH = 20  # Largura fixa do campo "count" para reescrever o cabeçalho no lugar ao fechar
+
+
+def video_hash(path, chunk_size=1 << 20):
+    """
+    SHA-256 do conteúdo do vídeo, lido em blocos para não carregar o arquivo na memória.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as video_file:
+        for chunk in iter(lambda: video_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _encode_header(header, count):
+    fields = dict(header)
+    fields["count"] = str(count).rjust(COUNT_WIDTH)
+    text = json.dumps(fields, ensure_ascii=False).encode("utf-8")
+    prefix = len(MAGIC) + 4
+    padded = -(-(prefix + len(text) + 1) // HEADER_ALIGN) * HEADER_ALIGN - prefix
+    text = text + b"\n" + b" " * (padded - len(text) - 1)
+    return MAGIC + struct.pack("<I", len(text)) + text
+
+
+class TrajectoryWriter:
+    """
+    Grava uma trajetória em .traj enquanto o vídeo é processado. Os registros são acumulados
+    num buffer de tamanho fixo e despejados no disco em blocos; a contagem no cabeçalho é
+    atualizada ao fechar. Pode ser usado como gerenciador de contexto.
+    """
+    def __init__(self, path, dtype, fps=None, scale=None, source_hash=None, buffer_size=4096, **extra):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.header = {"dtype": self.dtype.descr, "fps": fps, "scale": scale, "video_hash": source_hash, **extra}
+        self.buffer = np.empty(buffer_size, dtype=self.dtype)
+        self.pending = 0
+        self.count = 0
+
+        self.file = open(path, "wb")
+        self.file.write(_encode_header(self.header, 0))
+
+    def append(self, row):
+        self.buffer[self.pending] = row
+        self.pending += 1
+        if self.pending == len(self.buffer):
+            self.flush()
+
+    def extend(self, rows):
+        self.flush()
+        np.asarray(rows, dtype=self.dtype).tofile(self.file)
+        self.count += len(rows)
+
+    def flush(self):
+        if self.pending:
+            self.buffer[:self.pending].tofile(self.file)
+            self.count += self.pending
+            self.pending = 0
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.seek(0)
+        self.file.write(_encode_header(self.header, self.count))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_header(path):
+    """
+    Lê o cabeçalho de um .traj. Retorna (cabeçalho, offset dos registros, dtype).
+    """
+    with open(path, "rb") as traj_file:
+        magic = traj_file.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"Arquivo de trajetória inválido: {path}")
+        (length,) = struct.unpack("<I", traj_file.read(4))
+        header = json.loads(traj_file.read(length).decode("utf-8"))
+
+    header["count"] = int(header["count"])
+    dtype = np.dtype([tuple(field) for field in header["dtype"]])
+    return header, len(MAGIC) + 4 + length, dtype
+
+
+def open_trajectory(path, mode="r"):
+    """
+    Abre um .traj sem carregá-lo na memória. Retorna (cabeçalho, np.memmap estruturado).
+    Se o gravador não chegou a fechar o arquivo, a contagem é deduzida do tamanho em disco.
+    """
+    header, offset, dtype = read_header(path)
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if header["count"] and header["count"] <= count:
+        count = header["count"]
+    if count == 0:
+        return header, np.empty(0, dtype=dtype)
+    return header, np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(count,))
+
+
+def save_trajectory(path, trajectory, **header):
+    """
+    Grava de uma vez um array estruturado já em memória.
+    """
+    with TrajectoryWriter(path, trajectory.dtype, **header) as writer:
+        writer.extend(trajectory)